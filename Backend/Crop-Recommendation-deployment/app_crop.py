@@ -1,26 +1,166 @@
 from flask import Flask, request, jsonify
+import hmac
 import logging
 import sys
 import os
+import threading
+import time
 from flask_cors import CORS
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from score_crop import CropRecommendationModel
+from score_crop import (
+    CropRecommendationModel, INPUT_FIELDS, EXPLAIN_MODES, DEFAULT_EXPLAIN_MODE, WARMUP_INPUT, artifact_path
+)
+import artifact_bundle
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
 
-# Initialize crop model
-crop_model = CropRecommendationModel()
-init_success = crop_model.init()
+# Optional bearer-token check on prediction endpoints, verified locally with
+# flora-auth's token_auth module (put Backend/flora-auth on PYTHONPATH)
+if os.environ.get('REQUIRE_AUTH', '0') == '1':
+    from token_auth import TokenVerifier, require_auth
+    auth_required = require_auth(TokenVerifier(os.environ['JWT_SECRET'].strip()))
+else:
+    def auth_required(view):
+        return view
+
+# Prometheus-style /metrics, queued JSON logging and model hot reload from
+# the shared flora_common package (Backend/flora-common, installed into the image)
+from flora_common.service_metrics import ServiceMetrics
+from flora_common.structured_logging import configure_logging
+from flora_common.model_slot import ModelSlot, ReloadInProgress
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging('crop')
 logger = logging.getLogger(__name__)
 
+# Startup: by default the model loads before the app is served. With
+# CROP_BACKGROUND_INIT=1 the port opens at once and the model loads on a
+# background thread, followed by a warm-up prediction (CROP_WARMUP=0 skips
+# it). /health/ready answers 503 until that is done.
+BACKGROUND_INIT = os.environ.get('CROP_BACKGROUND_INIT', '0') == '1'
+WARMUP = os.environ.get('CROP_WARMUP', '1' if BACKGROUND_INIT else '0') == '1'
+
+# Hot reload (see flora_common.model_slot): POST /admin/reload and /admin/rollback
+# with an X-Admin-Token header matching CROP_ADMIN_TOKEN (the endpoints are
+# off without one), and/or CROP_WATCH_INTERVAL seconds between polls of the
+# artifact files
+ADMIN_TOKEN = os.environ.get('CROP_ADMIN_TOKEN', '').strip()
+WATCH_INTERVAL = float(os.environ.get('CROP_WATCH_INTERVAL', 0))
+
+crop_model = CropRecommendationModel()
+init_success = False
+# XGBoost threads per worker, set by after_fork and applied to reloaded models too
+worker_threads = None
+
+metrics = ServiceMetrics('crop')
+metrics.instrument_flask(app)
+startup = {"state": "starting", "load_seconds": None, "warmup_seconds": None}
+
+def load_model():
+    """Load the crop model, warm it up, then mark the service ready"""
+    global init_success
+    start = time.perf_counter()
+    loaded = crop_model.init()
+    startup["load_seconds"] = round(time.perf_counter() - start, 3)
+    
+    if loaded and WARMUP:
+        start = time.perf_counter()
+        try:
+            crop_model.warmup()
+        except Exception as e:
+            logger.error(f"Crop model warm-up failed: {str(e)}")
+        startup["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    
+    # Stage timings from here on, so the warm-up is not counted
+    crop_model.stage_observer = metrics.observe_stage
+    if loaded:
+        models.install(crop_model, startup["load_seconds"])
+    init_success = loaded
+    startup["state"] = "ready" if loaded else "failed"
+    models.start_watching(WATCH_INTERVAL)
+
+def load_new_model():
+    """A new model for a reload, loaded from the current artifacts"""
+    model = CropRecommendationModel()
+    if not model.init():
+        raise RuntimeError("Crop model failed to initialize; see the log for details")
+    if worker_threads:
+        model.after_fork(worker_threads)
+    return model
+
+def validate_model(model):
+    """Warm up a reloaded model and check it scores a known sample sensibly"""
+    import numpy as np
+    
+    model.warmup()
+    probabilities = model.predict_proba([WARMUP_INPUT])
+    # A model and label encoder from different training runs disagree on the class count
+    if probabilities.shape != (1, len(model.class_names)):
+        raise ValueError(f"Model returns {probabilities.shape[1]} classes, "
+                         f"label encoder has {len(model.class_names)}")
+    if not np.isfinite(probabilities).all() or abs(probabilities.sum() - 1) > 1e-3:
+        raise ValueError("Model returns invalid probabilities")
+    # Stage timings from here on, so the warm-up is not counted
+    model.stage_observer = metrics.observe_stage
+
+def activate_model(model):
+    """Point the request handlers at `model`"""
+    global crop_model, init_success
+    crop_model = model
+    # A reload also recovers a service whose startup load failed
+    init_success = True
+    startup["state"] = "ready"
+
+def watched_files():
+    files = [artifact_path(name) for name in artifact_bundle.SOURCE_FILES]
+    files.append(os.path.join(artifact_bundle.BUNDLE_DIR, 'manifest.json'))
+    files.append(artifact_path('metadata.json'))
+    return files
+
+models = ModelSlot('crop', load_new_model, activate_model, watched_files, validate=validate_model,
+                   metadata_path=artifact_path('metadata.json'))
+
+if BACKGROUND_INIT:
+    threading.Thread(target=load_model, name="crop-model-loader", daemon=True).start()
+else:
+    load_model()
+
+def _model_unavailable():
+    """Error response while the model is loading or after it failed to load, else None"""
+    if init_success:
+        return None
+    if startup["state"] == "starting":
+        response = jsonify({"error": "Crop model is still loading"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({"error": "Crop model not initialized"}), 500
+
+def after_fork(threads=None):
+    """Called by gunicorn.conf.py in each worker forked from the preloaded master"""
+    global worker_threads
+    worker_threads = threads
+    crop_model.after_fork(threads)
+
+def _admin_denied():
+    """Error response unless the request carries the admin token, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid admin token"}), 403
+    return None
+
+# Upper bound on rows accepted by /recommend/batch
+MAX_BATCH_SIZE = int(os.environ.get('CROP_MAX_BATCH_SIZE', 10000))
+# Upper bound on grid points per /recommend/sweep, and the default number of
+# crops whose probability surfaces it returns
+MAX_SWEEP_POINTS = int(os.environ.get('CROP_MAX_SWEEP_POINTS', 10000))
+DEFAULT_SWEEP_CROPS = int(os.environ.get('CROP_SWEEP_TOP_CROPS', 3))
+
 @app.route('/')
 def home():
     return jsonify({
@@ -32,15 +172,75 @@ def home():
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
-        "status": "healthy",
-        "model_initialized": init_success
+        "status": "healthy" if init_success else startup["state"],
+        "model_initialized": init_success,
+        "startup": startup,
+        "engine": "native" if crop_model.engine is not None else "sklearn",
+        "artifacts": crop_model.artifact_info(),
+        "model_version": models.status(),
+        "cache": crop_model.cache_stats()
     })
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """The process is up and serving; says nothing about the model"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """200 once the model is loaded and warmed up, 503 until then or after a failed load"""
+    return jsonify({"ready": init_success, **startup}), 200 if init_success else 503
+
+def _get_explain_mode(data=None, default=DEFAULT_EXPLAIN_MODE):
+    """Read the explain option from the query string, form or JSON body"""
+    mode = request.args.get('explain') or request.form.get('explain')
+    if mode is None and isinstance(data, dict):
+        mode = data.get('explain')
+    mode = str(mode or default).strip().lower()
+    if mode not in EXPLAIN_MODES:
+        return None
+    return mode
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load the current artifacts as a new model version and swap it in.
+
+    Answers 202 at once and loads in the background; ?wait=1 answers when
+    the new version is serving (200) or failed to load (500).
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        if request.args.get('wait') == '1':
+            models.reload()
+            return jsonify({"status": "reloaded", **models.status()})
+        models.reload_async()
+        return jsonify({"status": "loading", **models.status()}), 202
+    except ReloadInProgress as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": "Reload failed, previous version still serving", "details": str(e)}), 500
+
+@app.route('/admin/rollback', methods=['POST'])
+def admin_rollback():
+    """Swap the previous model version back in"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        models.rollback()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"status": "rolled back", **models.status()})
+
 @app.route('/recommend', methods=['POST'])
+@auth_required
 def recommend_crop():
     try:
-        if not init_success:
-            return jsonify({"error": "Crop model not initialized"}), 500
+        unavailable = _model_unavailable()
+        if unavailable:
+            return unavailable
         
         # Get JSON data from request
         data = request.get_json()
@@ -59,6 +259,10 @@ def recommend_crop():
             if param not in data:
                 return jsonify({"error": f"Missing parameter: {param}"}), 400
         
+        explain = _get_explain_mode(data)
+        if explain is None:
+            return jsonify({"error": f"explain must be one of: {', '.join(EXPLAIN_MODES)}"}), 400
+        
         # Prepare input data
         input_data = {
             'nitrogen': float(data['nitrogen']),
@@ -73,7 +277,7 @@ def recommend_crop():
         logger.info(f"Received input: {input_data}")
         
         # Get prediction
-        result = crop_model.run(input_data)
+        result = crop_model.run(input_data, explain=explain)
 
         logger.info(f"Prediction: {result['crop']} ({result['confidence']:.2%})")
         
@@ -86,12 +290,222 @@ def recommend_crop():
         logger.error(f"Prediction error: {str(e)}")
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+def _parse_batch_request():
+    """Read batch rows from a CSV upload or a JSON array.
+
+    Returns (inputs, error) where inputs is a DataFrame with one column per
+    required parameter.
+    """
+    import pandas as pd
+    
+    required_params = list(INPUT_FIELDS)
+    
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '':
+            return None, "No file selected"
+        try:
+            frame = pd.read_csv(file)
+        except Exception as e:
+            return None, f"Could not parse CSV: {str(e)}"
+    else:
+        data = request.get_json(silent=True)
+        # Accept a bare array or {"samples": [...]}
+        if isinstance(data, dict):
+            data = data.get('samples')
+        if not isinstance(data, list):
+            return None, "Expected a JSON array of samples or a CSV file upload"
+        if not all(isinstance(row, dict) for row in data):
+            return None, "Each sample must be a JSON object"
+        frame = pd.DataFrame.from_records(data)
+    
+    if len(frame) == 0:
+        return None, "No samples provided"
+    
+    if len(frame) > MAX_BATCH_SIZE:
+        return None, f"Batch too large: {len(frame)} samples (max {MAX_BATCH_SIZE})"
+    
+    missing = [param for param in required_params if param not in frame.columns]
+    if missing:
+        return None, f"Missing parameter: {', '.join(missing)}"
+    
+    frame = frame[required_params]
+    incomplete = frame.isnull().any(axis=1)
+    if incomplete.any():
+        return None, f"Missing values in rows: {incomplete[incomplete].index.tolist()[:20]}"
+    
+    try:
+        frame = frame.astype(float)
+    except (TypeError, ValueError) as e:
+        return None, f"Invalid parameter type: {str(e)}"
+    
+    return frame, None
+
+@app.route('/recommend/batch', methods=['POST'])
+@auth_required
+def recommend_crop_batch():
+    """Score many soil samples in one request (JSON array or CSV upload)"""
+    try:
+        unavailable = _model_unavailable()
+        if unavailable:
+            return unavailable
+        
+        inputs, error = _parse_batch_request()
+        if error:
+            return jsonify({"error": error}), 400
+        
+        # Explanations are opt-in for batches
+        explain = _get_explain_mode(request.get_json(silent=True), default='none')
+        if explain is None:
+            return jsonify({"error": f"explain must be one of: {', '.join(EXPLAIN_MODES)}"}), 400
+        
+        results = crop_model.run_batch(inputs, explain=explain)
+        
+        logger.info(f"Batch prediction: {len(results)} samples")
+        
+        return jsonify({
+            "count": len(results),
+            "results": results
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
+def _parse_sweep_axis(axis):
+    """(field, values) from {"field", "values"} or {"field", "min", "max", "steps"}"""
+    import numpy as np
+    
+    if not isinstance(axis, dict):
+        return None, "Each axis must be a JSON object"
+    field = axis.get('field')
+    if field not in INPUT_FIELDS:
+        return None, f"Axis field must be one of: {', '.join(INPUT_FIELDS)}"
+    
+    try:
+        if 'values' in axis:
+            if not isinstance(axis['values'], list) or not axis['values']:
+                return None, f"{field}: values must be a non-empty array"
+            values = np.asarray(axis['values'], dtype=float)
+        else:
+            missing = [key for key in ('min', 'max', 'steps') if key not in axis]
+            if missing:
+                return None, f"{field}: give values, or min, max and steps (missing {', '.join(missing)})"
+            steps = int(axis['steps'])
+            if steps < 1 or steps > MAX_SWEEP_POINTS:
+                return None, f"{field}: steps must be between 1 and {MAX_SWEEP_POINTS}"
+            values = np.linspace(float(axis['min']), float(axis['max']), steps)
+    except (TypeError, ValueError) as e:
+        return None, f"{field}: invalid number: {str(e)}"
+    
+    # Nested lists convert to a 2-d array
+    if values.ndim != 1:
+        return None, f"{field}: values must be a flat array of numbers"
+    if not np.isfinite(values).all():
+        return None, f"{field}: values must be finite numbers"
+    return (field, values), None
+
+def _parse_sweep_request(data):
+    """Validate a sweep request.
+
+    Returns (spec, error) where spec holds the keyword arguments for
+    CropRecommendationModel.sweep.
+    """
+    if not isinstance(data, dict):
+        return None, "No JSON data provided"
+    
+    axes_data = data.get('axes')
+    if not isinstance(axes_data, list) or not 1 <= len(axes_data) <= 2:
+        return None, "axes must be an array of one or two axes"
+    axes = []
+    for axis_data in axes_data:
+        axis, error = _parse_sweep_axis(axis_data)
+        if error:
+            return None, error
+        axes.append(axis)
+    fields = [field for field, _ in axes]
+    if len(set(fields)) != len(fields):
+        return None, "Each axis must vary a different field"
+    
+    points = 1
+    for _, values in axes:
+        points *= len(values)
+    if points > MAX_SWEEP_POINTS:
+        return None, f"Sweep too large: {points} grid points (max {MAX_SWEEP_POINTS})"
+    
+    # The base input is a full /recommend request; swept fields may be left out
+    base_data = data.get('base')
+    if not isinstance(base_data, dict):
+        return None, "base must be a JSON object of input parameters"
+    base = {}
+    for param in INPUT_FIELDS:
+        if param not in base_data:
+            if param not in fields:
+                return None, f"Missing parameter: {param}"
+            # No base value: the base point uses the axis midpoint
+            values = dict(axes)[param]
+            base[param] = float(values[len(values) // 2])
+            continue
+        try:
+            base[param] = float(base_data[param])
+        except (TypeError, ValueError) as e:
+            return None, f"Invalid parameter type: {str(e)}"
+    
+    crops = data.get('crops')
+    if crops is not None and (not isinstance(crops, list) or not all(isinstance(crop, str) for crop in crops)):
+        return None, "crops must be an array of crop names"
+    
+    try:
+        top_crops = int(data.get('top_crops', DEFAULT_SWEEP_CROPS))
+        precision = int(data.get('precision', 4))
+    except (TypeError, ValueError) as e:
+        return None, f"Invalid parameter type: {str(e)}"
+    if top_crops < 1:
+        return None, "top_crops must be at least 1"
+    if not 0 <= precision <= 8:
+        return None, "precision must be between 0 and 8"
+    
+    return {"base": base, "axes": axes, "crops": crops, "top_crops": top_crops, "precision": precision}, None
+
+@app.route('/recommend/sweep', methods=['POST'])
+@auth_required
+def recommend_crop_sweep():
+    """What-if sweep: crop probabilities over a grid of one or two inputs.
+
+    Body: {"base": {...}, "axes": [{"field": "nitrogen", "min": 0, "max": 140,
+    "steps": 50}, {"field": "rainfall", "values": [...]}]}, optionally with
+    "crops" (surfaces to return), "top_crops" and "precision".
+    """
+    try:
+        unavailable = _model_unavailable()
+        if unavailable:
+            return unavailable
+        
+        spec, error = _parse_sweep_request(request.get_json(silent=True))
+        if error:
+            return jsonify({"error": error}), 400
+        
+        result = crop_model.sweep(**spec)
+        
+        logger.info(f"Sweep over {' x '.join(axis['field'] for axis in result['axes'])}: "
+                    f"{result['points']} points")
+        
+        return jsonify(result)
+        
+    except ValueError as e:
+        logger.error(f"Value error: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Sweep error: {str(e)}")
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
 @app.route('/crops', methods=['GET'])
 def get_available_crops():
     """Get list of all available crops in the model"""
     try:
-        if not init_success:
-            return jsonify({"error": "Model not initialized"}), 500
+        unavailable = _model_unavailable()
+        if unavailable:
+            return unavailable
             
         crops = crop_model.label_encoder.classes_.tolist()
         return jsonify({"available_crops": crops})
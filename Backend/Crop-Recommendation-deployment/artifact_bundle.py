@@ -0,0 +1,236 @@
+"""Versioned artifact bundle for fast crop model startup.
+
+    python artifact_bundle.py build [--version 2025-10-21]
+    python artifact_bundle.py verify
+
+bundle/
+  manifest.json     format and model version, library versions, sha256 + size per file
+  booster.ubj       XGBoost's native binary model (no sklearn/XGBoost pickle)
+  preprocess.json   scaler statistics, label classes and feature order
+  background.npy    SHAP background rows, memory-mapped on load
+  explainers.pkl    prebuilt TreeExplainers; only used when the shap version matches
+
+The model, scaler and label classes load without unpickling. The SHAP
+explainers do not: explainers.pkl (about 50 MB) is a pickle, because
+rebuilding the TreeExplainers from the booster is the slowest part of
+startup. Like the notebook pickles it replaces, it must only come from a
+trusted build (the image's own `build` step).
+
+build reads the notebook pickles that sit next to this file. At startup
+every file's size is checked against the manifest. Full sha256
+verification runs when CROP_BUNDLE_VERIFY=1.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+BUNDLE_NAME = "crop-recommendation-xgboost"
+MODEL_DIR = os.environ.get('CROP_MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+BUNDLE_DIR = os.environ.get('CROP_BUNDLE_DIR', os.path.join(MODEL_DIR, 'bundle'))
+VERIFY_CHECKSUMS = os.environ.get('CROP_BUNDLE_VERIFY', '0') == '1'
+
+# The notebook pickles a bundle is built from
+SOURCE_FILES = ('best_model_XGBoost.pkl', 'scaler.pkl', 'label_encoder.pkl', 'feature_names.pkl', 'X_background.pkl')
+
+
+class BundleError(Exception):
+    """The bundle is missing, incomplete or doesn't match its manifest"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _library_versions():
+    import shap
+    import sklearn
+    import xgboost
+    return {"xgboost": xgboost.__version__, "shap": shap.__version__,
+            "scikit-learn": sklearn.__version__, "numpy": np.__version__}
+
+
+def read_manifest(bundle_dir=BUNDLE_DIR, verify_checksums=VERIFY_CHECKSUMS):
+    """Parsed manifest.json, or None when there is no bundle"""
+    path = os.path.join(bundle_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format_version')}")
+    for name, entry in manifest['files'].items():
+        file_path = os.path.join(bundle_dir, name)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != entry['bytes']:
+            raise BundleError(f"{name} is missing or has the wrong size")
+        if verify_checksums and _sha256(file_path) != entry['sha256']:
+            raise BundleError(f"{name} failed its sha256 check")
+    return manifest
+
+
+def stale_sources(bundle_dir=BUNDLE_DIR, source_dir=MODEL_DIR):
+    """Source pickles modified after the bundle was built (e.g. a new model dropped in)"""
+    manifest_path = os.path.join(bundle_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return []
+    built = os.path.getmtime(manifest_path)
+    return [
+        name for name in SOURCE_FILES
+        if os.path.exists(os.path.join(source_dir, name)) and os.path.getmtime(os.path.join(source_dir, name)) > built
+    ]
+
+
+def load_bundle(bundle_dir=BUNDLE_DIR):
+    """Load the bundle into the objects CropRecommendationModel uses.
+
+    Returns None when there is no bundle. The 'explainers' entry is None
+    when the bundle's explainers were built with a different shap version.
+    """
+    manifest = read_manifest(bundle_dir)
+    if manifest is None:
+        return None
+
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from xgboost import XGBClassifier
+
+    model = XGBClassifier()
+    model.load_model(os.path.join(bundle_dir, 'booster.ubj'))
+
+    with open(os.path.join(bundle_dir, 'preprocess.json')) as f:
+        preprocess = json.load(f)
+
+    scaler = StandardScaler()
+    for attribute in ('mean_', 'scale_', 'var_'):
+        setattr(scaler, attribute, np.asarray(preprocess['scaler'][attribute], dtype=np.float64))
+    scaler.n_samples_seen_ = preprocess['scaler']['n_samples_seen_']
+    scaler.n_features_in_ = len(preprocess['scaler']['feature_names_in_'])
+    scaler.feature_names_in_ = np.asarray(preprocess['scaler']['feature_names_in_'], dtype=object)
+
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.asarray(preprocess['classes'])
+
+    background = pd.DataFrame(
+        np.load(os.path.join(bundle_dir, 'background.npy'), mmap_mode='r'),
+        columns=preprocess['background_columns']
+    )
+
+    explainers = None
+    if 'explainers.pkl' in manifest['files']:
+        import shap
+        if manifest['libraries'].get('shap') == shap.__version__:
+            with open(os.path.join(bundle_dir, 'explainers.pkl'), 'rb') as f:
+                explainers = pickle.load(f)
+        else:
+            logger.warning("Bundle explainers were built with another shap version; rebuilding them")
+
+    return {
+        "manifest": manifest,
+        "model": model,
+        "scaler": scaler,
+        "label_encoder": label_encoder,
+        "feature_columns": list(preprocess['feature_columns']),
+        "background": background,
+        "explainers": explainers
+    }
+
+
+def build_bundle(bundle_dir=BUNDLE_DIR, version=None, source_dir=MODEL_DIR, with_explainers=True):
+    """Convert the notebook pickles in `source_dir` into a bundle"""
+    import joblib
+    import shap
+
+    model, scaler, label_encoder, feature_columns, background = (
+        joblib.load(os.path.join(source_dir, name)) for name in SOURCE_FILES
+    )
+
+    if version is None:
+        metadata_path = os.path.join(source_dir, 'metadata.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                version = json.load(f).get('training_date')
+    version = version or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    model.save_model(os.path.join(bundle_dir, 'booster.ubj'))
+
+    with open(os.path.join(bundle_dir, 'preprocess.json'), 'w') as f:
+        json.dump({
+            "scaler": {
+                "mean_": scaler.mean_.tolist(),
+                "scale_": scaler.scale_.tolist(),
+                "var_": scaler.var_.tolist(),
+                "n_samples_seen_": int(scaler.n_samples_seen_),
+                "feature_names_in_": [str(c) for c in getattr(scaler, 'feature_names_in_', feature_columns)]
+            },
+            "classes": [str(c) for c in label_encoder.classes_],
+            "feature_columns": list(feature_columns),
+            "background_columns": [str(c) for c in background.columns]
+        }, f, indent=2)
+
+    np.save(os.path.join(bundle_dir, 'background.npy'), background.to_numpy(dtype=np.float64))
+
+    files = ['booster.ubj', 'preprocess.json', 'background.npy']
+    if with_explainers:
+        # Built from the reloaded booster, exactly as load_bundle() will see it
+        from xgboost import XGBClassifier
+        bundled_model = XGBClassifier()
+        bundled_model.load_model(os.path.join(bundle_dir, 'booster.ubj'))
+        explainers = (
+            shap.TreeExplainer(bundled_model, data=background, feature_perturbation="interventional"),
+            shap.TreeExplainer(bundled_model, feature_perturbation="tree_path_dependent")
+        )
+        with open(os.path.join(bundle_dir, 'explainers.pkl'), 'wb') as f:
+            pickle.dump(explainers, f, protocol=pickle.HIGHEST_PROTOCOL)
+        files.append('explainers.pkl')
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "name": BUNDLE_NAME,
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "libraries": _library_versions(),
+        "files": {
+            name: {"sha256": _sha256(os.path.join(bundle_dir, name)),
+                   "bytes": os.path.getsize(os.path.join(bundle_dir, name))}
+            for name in files
+        }
+    }
+    # Written last: a bundle without a manifest is ignored by the loader
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the crop model artifact bundle")
+    parser.add_argument('command', choices=('build', 'verify'))
+    parser.add_argument('--bundle-dir', default=BUNDLE_DIR)
+    parser.add_argument('--version', default=None, help="Defaults to training_date in metadata.json")
+    parser.add_argument('--no-explainers', action='store_true', help="Skip the prebuilt SHAP explainers")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        manifest = build_bundle(args.bundle_dir, version=args.version, with_explainers=not args.no_explainers)
+    else:
+        manifest = read_manifest(args.bundle_dir, verify_checksums=True)
+        if manifest is None:
+            raise SystemExit(f"No bundle in {args.bundle_dir}")
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
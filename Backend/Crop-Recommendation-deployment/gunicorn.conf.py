@@ -0,0 +1,37 @@
+"""gunicorn settings: load the model once in the master, fork the workers.
+
+With preload_app the XGBoost model, scaler and SHAP explainers are loaded
+before forking and shared copy-on-write by every worker. Each worker
+runs cores // workers XGBoost threads unless CROP_XGB_THREADS is set.
+
+With CROP_BACKGROUND_INIT=1 nothing is preloaded: every worker opens its
+port at once and loads and warms up its own copy in the background.
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app_crop:app
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+timeout = 120
+preload_app = os.environ.get('CROP_BACKGROUND_INIT', '0') != '1'
+
+
+def when_ready(server):
+    # Objects loaded so far go to the permanent GC generation, so collections
+    # in the workers don't touch (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    xgb_threads = int(os.environ.get('CROP_XGB_THREADS', 0))
+    xgb_threads = xgb_threads or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+
+    if server.cfg.preload_app:
+        import app_crop
+        app_crop.after_fork(xgb_threads)
+    else:
+        # The worker imports XGBoost after this; OpenMP reads the limit then
+        os.environ['OMP_NUM_THREADS'] = str(xgb_threads)
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU cache of crop predictions keyed on rounded inputs.
+
+    Sensor clients resend near-identical readings, so inputs are rounded to
+    `precision` decimals before being used as a key. Entries expire after
+    `ttl` seconds and the least recently used entry is dropped once
+    `max_size` is reached.
+    """
+
+    def __init__(self, fields, max_size=1024, ttl=300, precision=2):
+        self.fields = tuple(fields)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, input_data, *extra):
+        """Quantize the request fields into a hashable key"""
+        return tuple(extra) + tuple(round(float(input_data[f]), self.precision) for f in self.fields)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "precision": self.precision,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
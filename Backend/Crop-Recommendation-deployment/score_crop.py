@@ -1,15 +1,109 @@
 import warnings
 warnings.filterwarnings('ignore')
 
-import json
 import logging
-import pandas as pd
+import os
+import time
 import numpy as np
 import joblib
-import shap
+
+import artifact_bundle
+from prediction_cache import PredictionCache
 
 logger = logging.getLogger(__name__)
 
+# Model artifacts live next to this file unless CROP_MODEL_DIR points elsewhere,
+# so the service also loads when started from another directory (e.g. the gateway)
+MODEL_DIR = os.environ.get('CROP_MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+
+def artifact_path(name):
+    return os.path.join(MODEL_DIR, name)
+
+# pandas and shap (over a second to import) are imported where they are first
+# used, so the app can open its port before the model is loaded
+
+# Request parameter -> raw feature name used during training
+INPUT_FIELDS = {
+    'nitrogen': 'N',
+    'phosphorus': 'P',
+    'potassium': 'K',
+    'temperature': 'temperature',
+    'humidity': 'humidity',
+    'ph': 'ph',
+    'rainfall': 'rainfall'
+}
+
+# SHAP explanation modes: skip it, path-dependent TreeSHAP, or the notebook's
+# interventional explainer over the full X_background
+EXPLAIN_MODES = ('none', 'fast', 'full')
+DEFAULT_EXPLAIN_MODE = os.environ.get('CROP_EXPLAIN_DEFAULT', 'full').strip().lower()
+if DEFAULT_EXPLAIN_MODE not in EXPLAIN_MODES:
+    DEFAULT_EXPLAIN_MODE = 'full'
+
+# Optional result cache: size 0 disables it, precision is the number of
+# decimals inputs are rounded to before lookup
+CACHE_SIZE = int(os.environ.get('CROP_CACHE_SIZE', 0))
+CACHE_TTL = float(os.environ.get('CROP_CACHE_TTL', 300))
+CACHE_PRECISION = int(os.environ.get('CROP_CACHE_PRECISION', 2))
+
+# Inference engine: 'sklearn' (scaler + XGBClassifier wrapper) or 'native'
+# (folded NumPy scaling + Booster.inplace_predict)
+ENGINE = os.environ.get('CROP_ENGINE', 'sklearn').strip().lower()
+PARITY_TOLERANCE = 1e-5
+
+# Typical request used by warmup()
+WARMUP_INPUT = {
+    'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 20.9,
+    'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9
+}
+
+# Load from bundle/ (see artifact_bundle.py) when one has been built;
+# the notebook pickles are used otherwise or when the bundle is broken
+USE_BUNDLE = os.environ.get('CROP_USE_BUNDLE', '1') == '1'
+
+
+class NativeBoosterEngine:
+    """Scaler and XGBoost booster inference on plain NumPy arrays.
+
+    StandardScaler's (x - mean) / scale is folded into one multiply-add and
+    the booster is called directly, skipping DataFrame construction,
+    feature-name validation and the sklearn wrapper.
+    """
+    
+    def __init__(self, model, scaler):
+        self.booster = model.get_booster()
+        self.objective = model.objective
+        
+        mean = scaler.mean_ if scaler.mean_ is not None else 0.0
+        scale = scaler.scale_ if scaler.scale_ is not None else 1.0
+        self.coef = np.asarray(1.0 / scale, dtype=np.float64)
+        self.offset = np.asarray(-mean / scale, dtype=np.float64)
+        
+        # Match the sklearn wrapper when training used early stopping
+        try:
+            self.iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+    
+    def predict_proba(self, features):
+        """Class probabilities for an (n_samples, n_features) array of engineered features"""
+        scaled = np.ascontiguousarray(features * self.coef + self.offset, dtype=np.float32)
+        
+        if self.objective == 'multi:softmax':
+            # softmax objective predicts labels; probabilities come from the margins
+            margin = self.booster.inplace_predict(
+                scaled, iteration_range=self.iteration_range, predict_type='margin'
+            )
+            exp = np.exp(margin - margin.max(axis=1, keepdims=True))
+            return exp / exp.sum(axis=1, keepdims=True)
+        
+        proba = self.booster.inplace_predict(scaled, iteration_range=self.iteration_range)
+        if proba.ndim == 1:
+            return np.column_stack([1 - proba, proba])
+        return proba
+
+
 class CropRecommendationModel:
     def __init__(self):
         self.model = None
@@ -17,18 +111,42 @@ class CropRecommendationModel:
         self.label_encoder = None
         self.feature_columns = None
         self.explainer = None
+        self.fast_explainer = None
         self.feature_meanings = None
+        self.cache = None
+        self.engine = None
+        self.class_names = None
+        self.background = None
+        self.bundle_manifest = None
+        # Called with (stage, seconds) for feature_engineering, scaling,
+        # predict_proba and shap
+        self.stage_observer = None
         
     def init(self):
         try:
-            # Load model and preprocessing objects
-            self.model = joblib.load('best_model_XGBoost.pkl')
-            self.scaler = joblib.load('scaler.pkl')
-            self.label_encoder = joblib.load('label_encoder.pkl')
-            self.feature_columns = joblib.load('feature_names.pkl')
+            bundle = self._load_bundle() if USE_BUNDLE else None
+            if bundle is not None:
+                self.model = bundle["model"]
+                self.scaler = bundle["scaler"]
+                self.label_encoder = bundle["label_encoder"]
+                self.feature_columns = bundle["feature_columns"]
+                self.background = bundle["background"]
+                self.bundle_manifest = bundle["manifest"]
+            else:
+                # Load model and preprocessing objects
+                self.model = joblib.load(artifact_path('best_model_XGBoost.pkl'))
+                self.scaler = joblib.load(artifact_path('scaler.pkl'))
+                self.label_encoder = joblib.load(artifact_path('label_encoder.pkl'))
+                self.feature_columns = joblib.load(artifact_path('feature_names.pkl'))
+                self.background = None
+                self.bundle_manifest = None
             
-            # Initialize SHAP explainer with the original background data
-            self._init_shap_explainer()
+            if bundle is not None and bundle["explainers"] is not None:
+                self.explainer, self.fast_explainer = bundle["explainers"]
+            else:
+                # Initialize SHAP explainer with the original background data
+                self._init_shap_explainer()
+                self._init_fast_shap_explainer()
             
             # Feature meanings for explanations
             self.feature_meanings = {
@@ -44,6 +162,18 @@ class CropRecommendationModel:
                 'THI': 'Combined effect of temperature and humidity on the environment'
             }
             
+            # Plain tuple lookup instead of label_encoder.inverse_transform per call
+            self.class_names = tuple(str(c) for c in self.label_encoder.classes_)
+            
+            self.engine = None
+            if ENGINE == 'native':
+                self._init_native_engine()
+            
+            if CACHE_SIZE > 0:
+                self.cache = PredictionCache(
+                    INPUT_FIELDS, max_size=CACHE_SIZE, ttl=CACHE_TTL, precision=CACHE_PRECISION
+                )
+            
             logger.info("✅ Crop model initialized successfully with original SHAP explainer")
             return True
             
@@ -51,11 +181,35 @@ class CropRecommendationModel:
             logger.error(f"❌ Error in crop model initialization: {str(e)}")
             return False
     
+    def _load_bundle(self):
+        """Artifacts from bundle/, or None to fall back to the notebook pickles"""
+        try:
+            stale = artifact_bundle.stale_sources()
+            if stale:
+                logger.warning(f"Crop model bundle is older than {', '.join(stale)}; loading pickles instead")
+                return None
+            bundle = artifact_bundle.load_bundle()
+            if bundle is not None:
+                manifest = bundle["manifest"]
+                logger.info(f"✅ Loaded crop model bundle {manifest['name']} {manifest['version']}")
+            return bundle
+        except Exception as e:
+            logger.error(f"❌ Crop model bundle unusable, loading pickles instead: {str(e)}")
+            return None
+    
+    def _background_data(self):
+        """The notebook's X_background, from the bundle when it was loaded from one"""
+        if self.background is None:
+            self.background = joblib.load(artifact_path('X_background.pkl'))
+        return self.background
+    
     def _init_shap_explainer(self):
         """Initialize SHAP explainer with the original background data"""
         try:
+            import shap
+            
             # Load the original X_background from the notebook
-            X_background = joblib.load('X_background.pkl')
+            X_background = self._background_data()
             
             # Use the exact same SHAP explainer as in the notebook
             self.explainer = shap.TreeExplainer(
@@ -70,30 +224,88 @@ class CropRecommendationModel:
             # Fallback to alternative method if X_background is not available
             self._init_shap_explainer_fallback()
     
+    def _init_fast_shap_explainer(self):
+        """Initialize the path-dependent explainer used by explain='fast'.
+
+        tree_path_dependent TreeSHAP walks the trees' own cover statistics
+        instead of every background row, so it needs no background data and
+        is roughly 30x cheaper per row than the interventional explainer.
+        """
+        try:
+            import shap
+            
+            self.fast_explainer = shap.TreeExplainer(
+                self.model,
+                feature_perturbation="tree_path_dependent"
+            )
+            logger.info("✅ Fast SHAP explainer initialized")
+            
+        except Exception as e:
+            logger.error(f"❌ Fast SHAP explainer failed: {str(e)}")
+            self.fast_explainer = None
+    
+    def _init_native_engine(self):
+        """Enable the native booster engine if it matches the sklearn path"""
+        try:
+            engine = NativeBoosterEngine(self.model, self.scaler)
+            report = self.check_engine_parity(engine)
+            
+            if not report["passed"]:
+                logger.error(f"❌ Native engine failed parity check, using sklearn engine: {report}")
+                return
+            
+            self.engine = engine
+            logger.info(f"✅ Native XGBoost engine enabled (max prob diff {report['max_abs_diff']:.2e})")
+            
+        except Exception as e:
+            logger.error(f"❌ Native engine unavailable, using sklearn engine: {str(e)}")
+            self.engine = None
+    
+    def check_engine_parity(self, engine, features=None):
+        """Compare an engine against scaler.transform + predict_proba.
+
+        `features` is a DataFrame of engineered features; the SHAP
+        background data is used when omitted.
+        """
+        if features is None:
+            features = self._background_data()
+        features = features[self.feature_columns]
+        
+        expected = self.model.predict_proba(self.scaler.transform(features))
+        actual = engine.predict_proba(features.to_numpy(dtype=np.float64))
+        
+        max_abs_diff = float(np.abs(expected - actual).max())
+        same_top_class = bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())
+        
+        return {
+            "samples": len(features),
+            "max_abs_diff": max_abs_diff,
+            "same_top_class": same_top_class,
+            "passed": same_top_class and max_abs_diff <= PARITY_TOLERANCE
+        }
+    
     def _init_shap_explainer_fallback(self):
         """Fallback method if X_background.pkl is not available"""
         try:
+            import pandas as pd
+            import shap
+            
             logger.warning("⚠️ Using fallback SHAP explainer with generated background data")
             
             # Create realistic background data based on typical crop data ranges
-            background_data = []
-            
-            for _ in range(100):
-                sample = {
-                    'N': np.random.uniform(0, 100),
-                    'P': np.random.uniform(0, 100),
-                    'K': np.random.uniform(0, 100),
-                    'temperature': np.random.uniform(10, 40),
-                    'humidity': np.random.uniform(20, 90),
-                    'ph': np.random.uniform(5.0, 8.0),
-                    'rainfall': np.random.uniform(50, 300)
-                }
-                
-                # Apply the same feature engineering
-                processed = self._engineer_features(sample)
-                background_data.append(list(processed.values()))
-            
-            background_df = pd.DataFrame(background_data, columns=self.feature_columns)
+            n_samples = 100
+            background_raw = {
+                'N': np.random.uniform(0, 100, n_samples),
+                'P': np.random.uniform(0, 100, n_samples),
+                'K': np.random.uniform(0, 100, n_samples),
+                'temperature': np.random.uniform(10, 40, n_samples),
+                'humidity': np.random.uniform(20, 90, n_samples),
+                'ph': np.random.uniform(5.0, 8.0, n_samples),
+                'rainfall': np.random.uniform(50, 300, n_samples)
+            }
+            
+            # Apply the same feature engineering
+            background_df = pd.DataFrame(self._engineer_features(background_raw), columns=self.feature_columns)
             
             self.explainer = shap.TreeExplainer(
                 self.model, 
@@ -107,168 +319,374 @@ class CropRecommendationModel:
             self.explainer = None
     
     def _engineer_features(self, input_data):
-        """Feature engineering - same as in training"""
+        """Feature engineering - same as in training.
+
+        Values may be scalars or equal-length NumPy arrays, so a whole batch
+        is engineered with a handful of array operations.
+        """
+        N = np.asarray(input_data['N'], dtype=float)
+        P = np.asarray(input_data['P'], dtype=float)
+        K = np.asarray(input_data['K'], dtype=float)
+        temperature = np.asarray(input_data['temperature'], dtype=float)
+        humidity = np.asarray(input_data['humidity'], dtype=float)
+        ph = np.asarray(input_data['ph'], dtype=float)
+        rainfall = np.asarray(input_data['rainfall'], dtype=float)
+        
         return {
-            'temp_rain': input_data['temperature'] * input_data['rainfall'],
-            'ph_rain': input_data['ph'] * input_data['rainfall'],
-            'K': input_data['K'],
-            'rainfall': input_data['rainfall'],
-            'N': input_data['N'],
-            'P': input_data['P'],
-            'NPK_Avg_Soil_Fertility': (input_data['N'] + input_data['P'] + input_data['K']) / 3,
-            'humidity': input_data['humidity'],
-            'NP_Ratio': input_data['N'] / input_data['P'] if input_data['P'] != 0 else 0,
-            'THI': (input_data['temperature'] * input_data['humidity']) / 100
+            'temp_rain': temperature * rainfall,
+            'ph_rain': ph * rainfall,
+            'K': K,
+            'rainfall': rainfall,
+            'N': N,
+            'P': P,
+            'NPK_Avg_Soil_Fertility': (N + P + K) / 3,
+            'humidity': humidity,
+            'NP_Ratio': np.divide(N, P, out=np.zeros_like(N), where=P != 0),
+            'THI': (temperature * humidity) / 100
         }
     
-    def preprocess_input(self, input_data):
-        """Preprocess input data to match training format"""
+    def _collect_columns(self, inputs):
+        """Turn a list of request dicts or a DataFrame of request fields into raw feature arrays"""
+        import pandas as pd
+        
+        if isinstance(inputs, pd.DataFrame):
+            return {raw: inputs[field].to_numpy(dtype=float) for field, raw in INPUT_FIELDS.items()}
+        
+        return {
+            raw: np.array([row[field] for row in inputs], dtype=float)
+            for field, raw in INPUT_FIELDS.items()
+        }
+    
+    def _observe(self, stage, seconds):
+        if self.stage_observer is not None:
+            self.stage_observer(stage, seconds)
+    
+    def _feature_matrix(self, inputs):
+        """Engineered features as an (n_samples, n_features) array in training column order"""
+        start = time.perf_counter()
+        engineered = self._engineer_features(self._collect_columns(inputs))
+        matrix = np.column_stack([engineered[feature] for feature in self.feature_columns])
+        self._observe('feature_engineering', time.perf_counter() - start)
+        return matrix
+    
+    def preprocess_batch(self, inputs):
+        """Preprocess many inputs at once with a single scaler.transform call"""
+        import pandas as pd
+        
         try:
-            # Create engineered features using the same method as training
-            processed_data = self._engineer_features({
-                'N': input_data['nitrogen'],
-                'P': input_data['phosphorus'],
-                'K': input_data['potassium'],
-                'temperature': input_data['temperature'],
-                'humidity': input_data['humidity'],
-                'ph': input_data['ph'],
-                'rainfall': input_data['rainfall']
-            })
+            start = time.perf_counter()
+            engineered = self._engineer_features(self._collect_columns(inputs))
             
             # Create DataFrame with correct column order
-            input_df = pd.DataFrame([processed_data], columns=self.feature_columns)
+            input_df = pd.DataFrame(engineered, columns=self.feature_columns)
+            engineered_at = time.perf_counter()
             
             # Scale the features for prediction
             scaled_features = self.scaler.transform(input_df)
             
+            self._observe('feature_engineering', engineered_at - start)
+            self._observe('scaling', time.perf_counter() - engineered_at)
+            return scaled_features, input_df
+            
+        except Exception as e:
+            logger.error(f"Error in batch preprocessing: {str(e)}")
+            raise
+    
+    def preprocess_input(self, input_data):
+        """Preprocess input data to match training format"""
+        try:
+            scaled_features, input_df = self.preprocess_batch([input_data])
+            processed_data = input_df.iloc[0].to_dict()
+            
             return scaled_features, processed_data, input_df
             
         except Exception as e:
             logger.error(f"Error in input preprocessing: {str(e)}")
             raise
     
-    def _extract_single_shap_vector(self, shap_raw, top_class_index, num_features, num_classes=None):
-        """Extract SHAP values for the top predicted class - same as notebook"""
+    def _extract_shap_matrix(self, shap_raw, top_indices, num_features, num_classes=None):
+        """Pick each sample's SHAP values for its predicted class -> (n_samples, num_features)"""
+        n_samples = len(top_indices)
         try:
-            arr = np.asarray(shap_raw)
-
+            if isinstance(shap_raw, list):
+                # Older shap releases return one (n_samples, num_features) array per class
+                arr = np.stack([np.asarray(a) for a in shap_raw], axis=-1)
+            else:
+                arr = np.asarray(shap_raw)
+            
             if arr.ndim == 1 and arr.shape[0] == num_features:
+                arr = arr.reshape(1, -1)
+            
+            if arr.ndim == 2 and arr.shape == (n_samples, num_features):
                 return arr
-
-            if arr.ndim == 2 and arr.shape[1] == num_features:
-                return arr[0]
-
-            shape = arr.shape
-            axes_with_features = [i for i, s in enumerate(shape) if s == num_features]
-            if not axes_with_features:
-                raise ValueError(f"Can't find an axis matching num_features={num_features} in shap array with shape {shape}")
-
-            feat_axis = axes_with_features[0]
-
-            idx = []
-            for i, s in enumerate(shape):
-                if i == feat_axis:
-                    idx.append(slice(None))
-                else:
-                    if (num_classes is not None and s == num_classes):
-                        idx.append(top_class_index)
-                    else:
-                        idx.append(0)
-
-            vec = arr[tuple(idx)].reshape(-1)
-            if vec.shape[0] != num_features:
-                raise ValueError(f"Extracted SHAP vector length {vec.shape[0]} doesn't match num_features={num_features}")
-            return vec
+            
+            if arr.ndim == 3 and arr.shape[0] == n_samples:
+                rows = np.arange(n_samples)
+                if arr.shape[1] == num_features and (num_classes is None or arr.shape[2] == num_classes):
+                    return arr[rows, :, top_indices]
+                if arr.shape[2] == num_features:
+                    return arr[rows, top_indices, :]
+            
+            raise ValueError(f"Can't find an axis matching num_features={num_features} in shap array with shape {arr.shape}")
             
         except Exception as e:
             logger.warning(f"SHAP extraction warning: {e}")
-            return np.zeros(num_features)
+            return np.zeros((n_samples, num_features))
     
-    def run(self, input_data):
+    def run(self, input_data, explain=None):
         try:
-            # Preprocess input
-            scaled_data, processed_features, input_df = self.preprocess_input(input_data)
-            
-            # Make prediction
-            prediction_proba = self.model.predict_proba(scaled_data)[0]
-            
-            # Get ONLY the top recommendation
-            top_index = np.argmax(prediction_proba)
-            crop = self.label_encoder.inverse_transform([top_index])[0]
-            confidence = float(prediction_proba[top_index])
-            
-            # SHAP Explanation - using the same method as notebook
-            explanation_data = self._get_shap_explanation(input_df, top_index, processed_features, crop)
-            
-            # Result format
-            result = {
-                "crop": crop,
-                "confidence": confidence,
-                "suitability": f"{confidence:.1%}",
-                "key_factors": explanation_data["explanations"] if "explanations" in explanation_data else [],
-                "input_summary": {
-                    "nitrogen": input_data['nitrogen'],
-                    "phosphorus": input_data['phosphorus'], 
-                    "potassium": input_data['potassium'],
-                    "temperature": input_data['temperature'],
-                    "humidity": input_data['humidity'],
-                    "ph": input_data['ph'],
-                    "rainfall": input_data['rainfall']
-                }
-            }
-            
-            return result
+            return self.run_batch([input_data], explain=explain or DEFAULT_EXPLAIN_MODE)[0]
             
         except Exception as e:
             logger.error(f"Error during crop prediction: {str(e)}")
             raise
     
-    def _get_shap_explanation(self, input_df, top_index, processed_features, crop):
-        """Generate SHAP explanation using the same method as notebook"""
+    def run_batch(self, inputs, explain='none'):
+        """Score many inputs with one scaler.transform and one predict_proba call.
+
+        `inputs` is a list of request dicts or a DataFrame with the request
+        field names as columns. `explain` is one of EXPLAIN_MODES; all rows
+        share a single shap_values call. When the result cache is enabled
+        only the rows it misses are scored.
+        """
+        import pandas as pd
+        
         try:
-            if self.explainer is None:
-                return {"explanations": ["Detailed explanation not available"]}
+            if explain not in EXPLAIN_MODES:
+                raise ValueError(f"explain must be one of {', '.join(EXPLAIN_MODES)}")
+            
+            if isinstance(inputs, pd.DataFrame):
+                inputs = inputs[list(INPUT_FIELDS)].to_dict('records')
+            
+            if self.cache is None:
+                predictions = self._predict(inputs, explain)
+            else:
+                predictions = self._predict_cached(inputs, explain)
+            
+            return [
+                self._format_result(input_data, *predictions[i])
+                for i, input_data in enumerate(inputs)
+            ]
             
+        except Exception as e:
+            logger.error(f"Error during batch crop prediction: {str(e)}")
+            raise
+    
+    def predict_proba(self, inputs):
+        """(n_samples, n_classes) class probabilities, without the result cache or SHAP"""
+        if self.engine is not None:
+            feature_matrix = self._feature_matrix(inputs)
+            start = time.perf_counter()
+            prediction_proba = self.engine.predict_proba(feature_matrix)
+        else:
+            scaled_data, _ = self.preprocess_batch(inputs)
+            start = time.perf_counter()
+            prediction_proba = self.model.predict_proba(scaled_data)
+        self._observe('predict_proba', time.perf_counter() - start)
+        return prediction_proba
+    
+    def sweep(self, base, axes, crops=None, top_crops=3, precision=4):
+        """What-if probability surfaces over a grid of one or two inputs.
+
+        `base` is a full request dict and `axes` a list of (field, values)
+        pairs; every other field keeps its base value. The whole grid plus
+        the base point is engineered, scaled and scored as one batch.
+        Surfaces are returned for `crops`, or else for the `top_crops`
+        crops with the highest probability anywhere on the grid, rounded
+        to `precision` decimals. Axis 0 is the outer list of every grid.
+        """
+        import pandas as pd
+        
+        unknown = [crop for crop in crops or () if crop not in self.class_names]
+        if unknown:
+            raise ValueError(f"Unknown crops: {', '.join(unknown)}")
+        
+        grids = np.meshgrid(*[np.asarray(values, dtype=float) for _, values in axes], indexing='ij')
+        shape = grids[0].shape
+        columns = {field: np.full(grids[0].size + 1, float(base[field])) for field in INPUT_FIELDS}
+        for (field, _), grid in zip(axes, grids):
+            # Last row stays the base input
+            columns[field][:-1] = grid.ravel()
+        
+        probabilities = self.predict_proba(pd.DataFrame(columns)).astype(float)
+        base_probabilities = probabilities[-1]
+        surfaces = probabilities[:-1].reshape(*shape, len(self.class_names))
+        
+        if crops:
+            selected = [self.class_names.index(crop) for crop in crops]
+        else:
+            peaks = surfaces.reshape(-1, len(self.class_names)).max(axis=0)
+            selected = np.argsort(-peaks, kind='stable')[:top_crops].tolist()
+        
+        best = surfaces.argmax(axis=-1)
+        recommended, recommended_grid = np.unique(best, return_inverse=True)
+        base_index = int(np.argmax(base_probabilities))
+        
+        def peak(i):
+            flat = int(surfaces[..., i].argmax())
+            at = np.unravel_index(flat, shape)
+            return {
+                "probability": round(float(surfaces[..., i].flat[flat]), precision),
+                "at": {field: float(values[position]) for (field, values), position in zip(axes, at)}
+            }
+        
+        return {
+            "axes": [{"field": field, "values": np.asarray(values, dtype=float).tolist()} for field, values in axes],
+            "shape": list(shape),
+            "points": int(grids[0].size),
+            "base": {
+                "crop": self.class_names[base_index],
+                "confidence": round(float(base_probabilities[base_index]), precision)
+            },
+            "recommended": {
+                "crops": [self.class_names[i] for i in recommended],
+                "grid": recommended_grid.reshape(shape).tolist()
+            },
+            "confidence": np.round(surfaces.max(axis=-1), precision).tolist(),
+            "surfaces": {self.class_names[i]: np.round(surfaces[..., i], precision).tolist() for i in selected},
+            "peaks": {self.class_names[i]: peak(i) for i in selected}
+        }
+    
+    def _predict(self, inputs, explain):
+        """Return (crop, confidence, explanation_data) for every input"""
+        if self.engine is not None:
+            feature_matrix = self._feature_matrix(inputs)
+            # The native engine scales inside predict_proba
+            start = time.perf_counter()
+            prediction_proba = self.engine.predict_proba(feature_matrix)
+            input_df = None
+        else:
+            scaled_data, input_df = self.preprocess_batch(inputs)
+            start = time.perf_counter()
+            prediction_proba = self.model.predict_proba(scaled_data)
+        self._observe('predict_proba', time.perf_counter() - start)
+        
+        # Get ONLY the top recommendation per row
+        top_indices = np.argmax(prediction_proba, axis=1)
+        confidences = prediction_proba[np.arange(len(top_indices)), top_indices]
+        crops = [self.class_names[i] for i in top_indices]
+        
+        # SHAP Explanation - using the same method as notebook
+        if explain == 'none':
+            explanations = [{}] * len(top_indices)
+        else:
+            if input_df is None:
+                import pandas as pd
+                input_df = pd.DataFrame(feature_matrix, columns=self.feature_columns)
+            start = time.perf_counter()
+            explanations = self._get_shap_explanations(input_df, top_indices, crops, explain)
+            self._observe('shap', time.perf_counter() - start)
+        
+        return [(crops[i], float(confidences[i]), explanations[i]) for i in range(len(top_indices))]
+    
+    def _predict_cached(self, inputs, explain):
+        """Serve repeated inputs from the cache and score the misses in one batch"""
+        keys = [self.cache.make_key(input_data, explain) for input_data in inputs]
+        predictions = [self.cache.get(key) for key in keys]
+        
+        misses = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if misses:
+            fresh = self._predict([inputs[i] for i in misses], explain)
+            for i, prediction in zip(misses, fresh):
+                predictions[i] = prediction
+                self.cache.put(keys[i], prediction)
+        
+        return predictions
+    
+    def after_fork(self, threads=None):
+        """Per-worker setup after forking from a preloaded master.
+
+        The booster, scaler and explainers are shared copy-on-write, so only
+        XGBoost's OpenMP thread count is set to this worker's share of cores.
+        """
+        if threads and self.model is not None:
+            self.model.set_params(n_jobs=threads)
+            self.model.get_booster().set_param({'nthread': threads})
+    
+    def warmup(self):
+        """Score one throwaway request per explain mode, around the result cache.
+
+        The first predict_proba and shap_values calls pay for OpenMP thread
+        pool start-up and SHAP's lazy setup; this takes that cost before
+        the service reports ready.
+        """
+        for mode in EXPLAIN_MODES:
+            self._predict([WARMUP_INPUT], mode)
+    
+    def artifact_info(self):
+        """Where the loaded artifacts came from, for /health"""
+        if self.bundle_manifest is None:
+            return {"source": "pickle"}
+        return {
+            "source": "bundle",
+            "name": self.bundle_manifest["name"],
+            "version": self.bundle_manifest["version"],
+            "created_at": self.bundle_manifest["created_at"]
+        }
+    
+    def cache_stats(self):
+        """Hit/miss counters for /health"""
+        if self.cache is None:
+            return {"enabled": False}
+        return self.cache.stats()
+    
+    def _format_result(self, input_data, crop, confidence, explanation_data):
+        """Build the response dict returned for a single recommendation"""
+        return {
+            "crop": crop,
+            "confidence": confidence,
+            "suitability": f"{confidence:.1%}",
+            "key_factors": explanation_data["explanations"] if "explanations" in explanation_data else [],
+            "input_summary": {
+                "nitrogen": input_data['nitrogen'],
+                "phosphorus": input_data['phosphorus'], 
+                "potassium": input_data['potassium'],
+                "temperature": input_data['temperature'],
+                "humidity": input_data['humidity'],
+                "ph": input_data['ph'],
+                "rainfall": input_data['rainfall']
+            }
+        }
+    
+    def _get_shap_explanations(self, input_df, top_indices, crops, mode='full', top_k=3):
+        """Generate SHAP explanations for every row with one shap_values call"""
+        explainer = self.fast_explainer if mode == 'fast' else self.explainer
+        if explainer is None:
+            return [{"explanations": ["Detailed explanation not available"]}] * len(top_indices)
+        
+        try:
             # Calculate SHAP values using the same method as notebook
-            shap_values_raw = self.explainer.shap_values(input_df)
+            shap_values_raw = explainer.shap_values(input_df)
             
-            # Extract SHAP values for top class using the same function as notebook
-            shap_values_for_sample = self._extract_single_shap_vector(
+            # Keep only each row's predicted class
+            shap_matrix = self._extract_shap_matrix(
                 shap_values_raw,
-                top_class_index=top_index,
+                top_indices,
                 num_features=len(self.feature_columns),
                 num_classes=len(self.model.classes_)
             )
             
-            # Get top 3 influential features
-            feature_importance = []
-            for i, feature in enumerate(self.feature_columns):
-                importance = {
-                    'feature': feature,
-                    'shap_value': float(shap_values_for_sample[i]),
-                    'value': float(processed_features[feature]),
-                    'meaning': self.feature_meanings.get(feature, feature)
-                }
-                feature_importance.append(importance)
-            
-            # Sort by absolute SHAP value
-            feature_importance.sort(key=lambda x: abs(x['shap_value']), reverse=True)
-            top_features = feature_importance[:3]
-            
-            # Generate explanation text - same format as notebook
-            explanations = []
-            for feature in top_features:
-                direction = "increased" if feature['shap_value'] > 0 else "decreased"
-                explanation = f"{feature['meaning']} (value: {feature['value']}) {direction} the likelihood of recommending {crop}."
-                explanations.append(explanation)
+            # Rank features by absolute SHAP value, keeping the top_k per row
+            feature_values = input_df[self.feature_columns].to_numpy()
+            top_features = np.argsort(-np.abs(shap_matrix), axis=1, kind='stable')[:, :top_k]
             
-            return {
-                "explanations": explanations
-            }
+            results = []
+            for row, crop in enumerate(crops):
+                # Generate explanation text - same format as notebook
+                explanations = []
+                for i in top_features[row]:
+                    feature = self.feature_columns[i]
+                    meaning = self.feature_meanings.get(feature, feature)
+                    value = float(feature_values[row, i])
+                    direction = "increased" if shap_matrix[row, i] > 0 else "decreased"
+                    explanations.append(f"{meaning} (value: {value}) {direction} the likelihood of recommending {crop}.")
+                results.append({"explanations": explanations})
+            
+            return results
             
         except Exception as e:
             logger.warning(f"SHAP explanation failed: {e}")
-            return {"explanations": ["Explanation generation failed"]}
+            return [{"explanations": ["Explanation generation failed"]}] * len(top_indices)
 
 # Initialize model instance
 crop_model = CropRecommendationModel()
@@ -276,9 +694,9 @@ crop_model = CropRecommendationModel()
 def init():
     return crop_model.init()
 
-def run(input_data):
+def run(input_data, explain=None):
     try:
-        result = crop_model.run(input_data)
+        result = crop_model.run(input_data, explain=explain)
         return result
     except Exception as e:
         return {"error": str(e), "status": "error"}
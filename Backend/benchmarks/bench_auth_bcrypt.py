@@ -0,0 +1,99 @@
+"""Login throughput of flora-auth against bcrypt cost factor and hashing pool size.
+
+Drives /login through the Flask test client from `--clients` concurrent
+threads against the local Supabase stub, for every combination of
+--rounds and --workers. Reports logins/s, p50/p99 latency and how many
+requests were shed with 503. Shed clients back off for 50ms before retrying.
+
+    python bench_auth_bcrypt.py --rounds 10 12 --workers 1 2 4 --clients 16
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_auth_pool import load_auth_app, summarize
+from supabase_stub import start_stub
+
+
+def run_logins(auth_app, email, password, clients, duration):
+    client = auth_app.app.test_client()
+    samples, statuses = [], {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post('/login', json={'email': email, 'password': password})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    samples.append(elapsed)
+            if response.status_code == 503:
+                # Shed request: back off like a client honouring Retry-After would
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    result = summarize(samples) if samples else {"iterations": 0}
+    result["logins_per_second"] = len(samples) / wall
+    result["status_counts"] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="Admission limit for the pool (default: 4 x workers)")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'auth_bcrypt.json'))
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub()
+    auth_app = load_auth_app(base_url)
+    auth_app.limiter.enabled = False
+
+    from password_hasher import PasswordHasher
+
+    password = 'benchmark'
+    report = {"clients": args.clients, "duration_seconds": args.duration, "runs": []}
+    for rounds in args.rounds:
+        email = f'bench-{rounds}@example.com'
+        auth_app.hasher = PasswordHasher(rounds=rounds, workers=1)
+        auth_app.create_user(email, auth_app.hash_password(password), 'Bench User')
+
+        for workers in args.workers:
+            auth_app.hasher = PasswordHasher(
+                rounds=rounds, workers=workers, max_pending=args.max_pending or 4 * workers
+            )
+            result = run_logins(auth_app, email, password, args.clients, args.duration)
+            result.update(rounds=rounds, workers=workers, max_pending=auth_app.hasher.max_pending)
+            report["runs"].append(result)
+            print(f"rounds={rounds} workers={workers}: {result['logins_per_second']:.1f} logins/s, "
+                  f"statuses={result['status_counts']}")
+
+    server.shutdown()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
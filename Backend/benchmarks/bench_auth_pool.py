@@ -0,0 +1,93 @@
+"""Supabase call latency in flora-auth: fresh connection per call vs pooled session.
+
+Starts the local Supabase stub, imports flora-auth against it and times
+the two round trips a login makes (get_user_by_email + update_last_login).
+Two modes are compared:
+- "per_call": Connection: close on every request, like the old
+  requests.get/post/patch calls
+- "pooled": the shared keep-alive session
+
+    python bench_auth_pool.py --iterations 300 --connect-delay-ms 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from supabase_stub import start_stub
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples):
+    return {
+        "iterations": len(samples),
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+        "mean_ms": 1000 * sum(samples) / len(samples)
+    }
+
+
+def load_auth_app(base_url):
+    os.environ['SUPABASE_URL'] = base_url
+    os.environ['SUPABASE_ANON_KEY'] = 'stub-key'
+    sys.path.insert(0, os.path.join(HERE, '..', 'flora-auth'))
+    import app as auth_app
+    return auth_app
+
+
+def time_login_round_trips(auth_app, email, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        user = auth_app.get_user_by_email(email)[0]
+        auth_app.update_last_login(user['id'])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--connect-delay-ms', type=float, default=30.0,
+                        help="Stub cost of opening a connection (stands in for TCP+TLS)")
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'auth_pool.json'))
+    args = parser.parse_args()
+
+    server, state, base_url = start_stub(connect_delay_ms=args.connect_delay_ms, latency_ms=args.latency_ms)
+    auth_app = load_auth_app(base_url)
+
+    email = 'bench@example.com'
+    auth_app.create_user(email, auth_app.hash_password('benchmark'), 'Bench User')
+
+    report = {"stub": {"connect_delay_ms": args.connect_delay_ms, "latency_ms": args.latency_ms}}
+
+    # Old behaviour: a new connection for every call
+    auth_app.supabase.session.headers['Connection'] = 'close'
+    connections = state.connections
+    report["per_call"] = summarize(time_login_round_trips(auth_app, email, args.iterations))
+    report["per_call"]["connections_opened"] = state.connections - connections
+
+    del auth_app.supabase.session.headers['Connection']
+    connections = state.connections
+    report["pooled"] = summarize(time_login_round_trips(auth_app, email, args.iterations))
+    report["pooled"]["connections_opened"] = state.connections - connections
+
+    server.shutdown()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Cold start of each model service from its bundle vs. its legacy artifacts.
+
+Every run is a fresh interpreter (CROP_USE_BUNDLE / DISEASE_USE_BUNDLE set
+to 1 or 0) that times importing the scoring module, init() and the first
+prediction. Build the bundles first with `python artifact_bundle.py build`
+(crop) and `python disease_bundle.py build` (disease).
+
+    python bench_cold_start.py --runs 5
+    DISEASE_MODEL_DIR=/models python bench_cold_start.py --services disease
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+
+# service -> (directory, scoring module, bundle switch)
+SERVICES = {
+    'crop': ('Crop-Recommendation-deployment', 'score_crop', 'CROP_USE_BUNDLE'),
+    'disease': ('plant-disease-detection', 'score', 'DISEASE_USE_BUNDLE')
+}
+
+CROP_INPUT = {'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 20.8,
+              'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9}
+
+
+def _leaf_image():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (256, 256), (60, 140, 60)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def child(service):
+    """Runs inside the fresh interpreter; prints one JSON line of timings"""
+    directory, module_name, _ = SERVICES[service]
+    sys.path.insert(0, os.path.join(BACKEND_DIR, directory))
+
+    start = time.perf_counter()
+    module = __import__(module_name)
+    imported = time.perf_counter()
+
+    if service == 'crop':
+        model = module.CropRecommendationModel()
+        sample = CROP_INPUT
+    else:
+        model = module.PlantDiseaseModel()
+        sample = _leaf_image()
+    if not model.init():
+        raise SystemExit(f"{service} model failed to initialize")
+    initialized = time.perf_counter()
+
+    model.run(sample)
+    predicted = time.perf_counter()
+
+    print(json.dumps({
+        "source": model.artifact_info()["source"],
+        "import_s": imported - start,
+        "init_s": initialized - imported,
+        "first_prediction_s": predicted - initialized,
+        "total_s": predicted - start
+    }))
+
+
+def measure(service, bundle, runs):
+    _, _, switch = SERVICES[service]
+    env = dict(os.environ, **{switch: '1' if bundle else '0'})
+    # Keep result caches out of the first prediction
+    env.setdefault('DISEASE_CACHE_ENTRIES', '0')
+
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', service],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {"service": service, "bundle": bundle, "source": samples[0]["source"], "runs": runs}
+    for key in ('import_s', 'init_s', 'first_prediction_s', 'total_s'):
+        result[key] = statistics.median(sample[key] for sample in samples)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--services', default='crop,disease')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'cold_start.json'))
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    report = []
+    for service in args.services.split(','):
+        for bundle in (False, True):
+            result = measure(service, bundle, args.runs)
+            report.append(result)
+            print(f"{service:>8} {result['source']:<10} import={result['import_s']:.2f}s "
+                  f"init={result['init_s']:.2f}s first={result['first_prediction_s']:.3f}s "
+                  f"total={result['total_s']:.2f}s")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
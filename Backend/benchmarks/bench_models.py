@@ -0,0 +1,190 @@
+"""In-process microbenchmarks for the crop and disease scoring code.
+
+crop:     preprocess_input, run / run_batch and _get_shap_explanations
+          over batch sizes, explain modes and both engines (sklearn, native)
+disease:  preprocess_image and run over image resolutions, the forward
+          pass (_infer) and run_many over batch sizes
+
+Each case runs for at least --min-time seconds and --min-iterations calls
+after a warm-up. It reports latency per call and rows (or images) per
+second. Service settings come from the usual environment variables
+(DISEASE_BACKEND, DISEASE_MODEL_DIR, ...) and are recorded in the report.
+
+    python bench_models.py --output results/models-baseline.json
+    DISEASE_BACKEND=onnx python bench_models.py --services disease --output results/models-onnx.json
+    python compare_reports.py results/models-baseline.json results/models-onnx.json
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+
+sys.path.insert(0, HERE)
+
+from bench_report import latency_summary, write_report
+
+# Measure the model, not the result caches
+os.environ.setdefault('CROP_CACHE_SIZE', '0')
+os.environ.setdefault('DISEASE_CACHE_ENTRIES', '0')
+os.environ.setdefault('DISEASE_LOG_TIMINGS', '0')
+
+CROP_BATCH_SIZES = {'none': (1, 8, 64, 512), 'fast': (1, 8, 64), 'full': (1, 8)}
+DISEASE_RESOLUTIONS = ((256, 256), (1024, 768), (4000, 3000))
+DISEASE_BATCH_SIZES = (1, 8, 16, 32)
+RUN_MANY_IMAGES = 32
+
+
+def time_case(fn, rows, min_time, min_iterations, warmup=1):
+    """Call fn() repeatedly; latency per call and rows per second"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < min_iterations or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - call_start)
+    summary = latency_summary(samples)
+    summary["throughput_per_s"] = rows * len(samples) / sum(samples)
+    return summary
+
+
+def crop_inputs(count, seed=0):
+    """Request dicts spread over the ranges seen in the training data"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'nitrogen': float(rng.uniform(0, 140)), 'phosphorus': float(rng.uniform(5, 145)),
+            'potassium': float(rng.uniform(5, 205)), 'temperature': float(rng.uniform(10, 40)),
+            'humidity': float(rng.uniform(15, 100)), 'ph': float(rng.uniform(4, 9)),
+            'rainfall': float(rng.uniform(20, 300))
+        }
+        for _ in range(count)
+    ]
+
+
+def bench_crop(args, record):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'Crop-Recommendation-deployment'))
+    import score_crop
+
+    model = score_crop.CropRecommendationModel()
+    if not model.init():
+        raise SystemExit("Crop model failed to initialize")
+
+    inputs = crop_inputs(max(max(sizes) for sizes in CROP_BATCH_SIZES.values()))
+    record("crop.preprocess_input", {}, time_case(
+        lambda: model.preprocess_input(inputs[0]), 1, args.min_time, args.min_iterations
+    ))
+
+    engines = {'sklearn': None, 'native': score_crop.NativeBoosterEngine(model.model, model.scaler)}
+    for engine_name, engine in engines.items():
+        model.engine = engine
+        for explain, batch_sizes in CROP_BATCH_SIZES.items():
+            for batch_size in batch_sizes:
+                batch = inputs[:batch_size]
+                if batch_size == 1:
+                    fn = lambda: model.run(batch[0], explain=explain)
+                else:
+                    fn = lambda: model.run_batch(batch, explain=explain)
+                record("crop.run", {"engine": engine_name, "explain": explain, "batch_size": batch_size},
+                       time_case(fn, batch_size, args.min_time, args.min_iterations))
+
+    # SHAP on its own, from already scaled and predicted rows
+    model.engine = None
+    for explain in ('fast', 'full'):
+        for batch_size in CROP_BATCH_SIZES[explain]:
+            scaled, input_df = model.preprocess_batch(inputs[:batch_size])
+            top_indices = np.argmax(model.model.predict_proba(scaled), axis=1)
+            crops = [model.class_names[i] for i in top_indices]
+            record("crop.get_shap_explanations", {"explain": explain, "batch_size": batch_size}, time_case(
+                lambda: model._get_shap_explanations(input_df, top_indices, crops, explain),
+                batch_size, args.min_time, args.min_iterations
+            ))
+
+
+def synthetic_jpeg(width, height, seed=0):
+    """A leaf-coloured gradient with noise, so the JPEG is about photo-sized"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([
+        40 + 60 * x / width, 110 + 80 * y / height, 50 + 30 * (x + y) / (width + height)
+    ], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def bench_disease(args, record):
+    import torch
+
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'plant-disease-detection'))
+    import score
+
+    model = score.PlantDiseaseModel()
+    if not model.init():
+        raise SystemExit("Disease model failed to initialize")
+
+    for width, height in DISEASE_RESOLUTIONS:
+        image = synthetic_jpeg(width, height)
+        params = {"resolution": f"{width}x{height}"}
+        record("disease.preprocess_image", params, {"jpeg_kb": len(image) // 1024, **time_case(
+            lambda: model.preprocess_image(image), 1, args.min_time, args.min_iterations
+        )})
+        record("disease.run", params, time_case(
+            lambda: model.run(image), 1, args.min_time, args.min_iterations
+        ))
+
+    input_tensor = model.preprocess_image(synthetic_jpeg(1024, 768))
+    for batch_size in DISEASE_BATCH_SIZES:
+        batch = input_tensor.expand(batch_size, -1, -1, -1).contiguous()
+        record("disease.infer", {"backend": model.backend, "batch_size": batch_size}, time_case(
+            lambda: model._infer(batch), batch_size, args.min_time, args.min_iterations
+        ))
+
+    images = [(f"{i}.jpg", synthetic_jpeg(1024, 768, seed=i)) for i in range(RUN_MANY_IMAGES)]
+    for batch_size in DISEASE_BATCH_SIZES:
+        record("disease.run_many", {"images": len(images), "batch_size": batch_size}, time_case(
+            lambda: list(model.run_many(images, batch_size=batch_size)),
+            len(images), args.min_time, args.min_iterations
+        ))
+
+    return {"torch_threads": torch.get_num_threads()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--services', default='crop,disease')
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds per case")
+    parser.add_argument('--min-iterations', type=int, default=3)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'models.json'))
+    args = parser.parse_args()
+
+    results = []
+
+    def record(name, params, summary):
+        results.append({"name": name, "params": params, **summary})
+        label = " ".join(f"{key}={value}" for key, value in params.items())
+        print(f"{name:<28} {label:<44} p50={summary['p50_ms']:9.2f}ms "
+              f"{summary['throughput_per_s']:10.1f}/s")
+
+    extra = {}
+    services = args.services.split(',')
+    if 'crop' in services:
+        bench_crop(args, record)
+    if 'disease' in services:
+        extra.update(bench_disease(args, record))
+
+    write_report(args.output, "models", results, **extra)
+
+
+if __name__ == '__main__':
+    main()
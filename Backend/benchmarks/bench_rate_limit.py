@@ -0,0 +1,118 @@
+"""Rate limiter overhead per request with many distinct client addresses.
+
+Times `hit()` for the login limit ("10 per minute") across --clients
+distinct IPs for each storage/strategy combination. It then checks that
+--processes workers sharing one sqlite:// file together allow exactly
+the limit for a single client.
+
+    python bench_rate_limit.py --requests 50000 --clients 20000 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'flora-auth'))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import rate_limit_storage  # noqa: F401  registers sqlite://
+
+LOGIN_LIMIT = parse("10 per minute")
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_hits(uri, strategy, requests, clients):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    addresses = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    rng = random.Random(0)
+    samples = []
+    for _ in range(requests):
+        address = addresses[rng.randrange(clients)]
+        start = time.perf_counter()
+        limiter.hit(LOGIN_LIMIT, 'login', address)
+        samples.append(time.perf_counter() - start)
+    return {
+        "storage": uri.split(':')[0],
+        "strategy": strategy,
+        "requests": requests,
+        "clients": clients,
+        "p50_us": 1e6 * percentile(samples, 0.50),
+        "p99_us": 1e6 * percentile(samples, 0.99),
+        "mean_us": 1e6 * sum(samples) / len(samples)
+    }
+
+
+def _shared_worker(uri, strategy, attempts, results):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    results.put(sum(limiter.hit(LOGIN_LIMIT, 'login', '203.0.113.7') for _ in range(attempts)))
+
+
+def shared_enforcement(uri, strategy, processes, attempts):
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_shared_worker, args=(uri, strategy, attempts, results))
+        for _ in range(processes)
+    ]
+    for w in workers:
+        w.start()
+    allowed = sum(results.get() for _ in workers)
+    for w in workers:
+        w.join()
+    return {
+        "storage": uri.split(':')[0],
+        "strategy": strategy,
+        "processes": processes,
+        "attempts": processes * attempts,
+        "allowed": allowed,
+        "limit": LOGIN_LIMIT.amount
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'rate_limit.json'))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='flora-ratelimit-')
+    configs = [
+        ('memory://', 'fixed-window'),
+        ('memory://', 'sliding-window-counter'),
+        (f'sqlite:///{workdir}/overhead-fixed.db', 'fixed-window'),
+        (f'sqlite:///{workdir}/overhead-sliding.db', 'sliding-window-counter'),
+    ]
+
+    report = {"overhead": [], "shared": []}
+    for uri, strategy in configs:
+        result = time_hits(uri, strategy, args.requests, args.clients)
+        report["overhead"].append(result)
+        print(f"{result['storage']:>7} {strategy:<24} p50={result['p50_us']:.1f}us p99={result['p99_us']:.1f}us")
+
+    for strategy in ('fixed-window', 'sliding-window-counter'):
+        for uri in ('memory://', f'sqlite:///{workdir}/shared-{strategy}.db'):
+            result = shared_enforcement(uri, strategy, args.processes, attempts=LOGIN_LIMIT.amount)
+            report["shared"].append(result)
+            print(f"{result['storage']:>7} {strategy:<24} {args.processes} workers allowed "
+                  f"{result['allowed']} (limit {result['limit']})")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
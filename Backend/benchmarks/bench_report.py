@@ -0,0 +1,94 @@
+"""JSON report format shared by bench_models.py and load_test.py.
+
+    {
+      "benchmark": "models",
+      "created_at": "...",
+      "environment": {python, platform, cpus, package versions, service env vars},
+      "results": [{"name": ..., "params": {...}, "p50_ms": ..., "throughput_per_s": ...}, ...]
+    }
+
+A result is identified by its name plus params, so compare_reports.py
+can line up two runs of the same suite.
+"""
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from importlib import metadata
+
+PACKAGES = ('numpy', 'pandas', 'scikit-learn', 'xgboost', 'shap', 'torch', 'torchvision',
+            'onnxruntime', 'Pillow', 'Flask', 'gunicorn', 'bcrypt', 'requests')
+
+# Settings that change performance, recorded with every report
+ENV_PREFIXES = ('CROP_', 'DISEASE_', 'AUTH_', 'BCRYPT_', 'SUPABASE_POOL', 'USER_CACHE_',
+                'TOKEN_CACHE_', 'RATELIMIT_', 'GATEWAY_', 'WEB_CONCURRENCY', 'GUNICORN_', 'OMP_NUM_THREADS')
+# ...except credentials that share those prefixes (CROP_ADMIN_TOKEN); checked
+# on the part of the name after the prefix, so TOKEN_CACHE_SIZE is kept
+SECRET_MARKERS = ('TOKEN', 'SECRET', 'KEY', 'PASSWORD')
+
+
+def _recorded_env_var(key):
+    prefix = next((prefix for prefix in ENV_PREFIXES if key.startswith(prefix)), None)
+    if prefix is None:
+        return False
+    return not any(marker in key[len(prefix):] for marker in SECRET_MARKERS)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(samples):
+    """Latency percentiles in ms for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    return {
+        "count": len(samples),
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p95_ms": 1000 * percentile(samples, 0.95),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+        "mean_ms": 1000 * sum(samples) / len(samples),
+        "max_ms": 1000 * max(samples)
+    }
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "packages": versions,
+        "env": {key: value for key, value in sorted(os.environ.items()) if _recorded_env_var(key)}
+    }
+
+
+def result_key(result):
+    return (result["name"],) + tuple(sorted((key, str(value)) for key, value in result.get("params", {}).items()))
+
+
+def write_report(path, benchmark, results, **extra):
+    report = {
+        "benchmark": benchmark,
+        "created_at": datetime.utcnow().isoformat(),
+        "environment": environment(),
+        **extra,
+        "results": results
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,88 @@
+"""Compare two benchmark reports and fail on throughput/latency regressions.
+
+Results are matched by name and params (see bench_report.py). A result
+regresses when the candidate's throughput drops, or its p50 or p99
+latency grows, by more than the allowed fraction, or when its error rate
+rises by more than --max-error-rate-increase. The exit status is 1 if
+anything regressed, so the comparison can gate a deploy.
+
+    python compare_reports.py results/baseline.json results/candidate.json --max-regression 0.10
+"""
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_report import load_report, result_key
+
+# metric -> True when higher is better
+METRICS = {'throughput_per_s': True, 'p50_ms': False, 'p99_ms': False}
+
+
+def relative_change(baseline, candidate):
+    if not baseline:
+        return None
+    return (candidate - baseline) / baseline
+
+
+def compare(baseline, candidate, max_regression, max_error_rate_increase):
+    """(rows for printing, number of regressions)"""
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    regressions = 0
+
+    for result in candidate["results"]:
+        before = baseline_results.get(result_key(result))
+        if before is None:
+            continue
+        label = " ".join([result["name"]] + [f"{key}={value}" for key, value in result.get("params", {}).items()])
+
+        for metric, higher_is_better in METRICS.items():
+            if before.get(metric) is None or result.get(metric) is None:
+                continue
+            change = relative_change(before[metric], result[metric])
+            if change is None:
+                continue
+            worse = -change if higher_is_better else change
+            regressed = worse > max_regression
+            regressions += regressed
+            rows.append((label, metric, before[metric], result[metric], change, regressed))
+
+        if 'error_rate' in result and 'error_rate' in before:
+            increase = result['error_rate'] - before['error_rate']
+            regressed = increase > max_error_rate_increase
+            regressions += regressed
+            rows.append((label, 'error_rate', before['error_rate'], result['error_rate'], increase, regressed))
+
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--max-regression', type=float, default=0.10,
+                        help="Allowed relative throughput drop or latency increase")
+    parser.add_argument('--max-error-rate-increase', type=float, default=0.01)
+    args = parser.parse_args()
+
+    baseline = load_report(args.baseline)
+    candidate = load_report(args.candidate)
+    if baseline["benchmark"] != candidate["benchmark"]:
+        raise SystemExit(f"Can't compare a {baseline['benchmark']} report with a {candidate['benchmark']} report")
+
+    rows, regressions = compare(baseline, candidate, args.max_regression, args.max_error_rate_increase)
+    if not rows:
+        raise SystemExit("The reports have no results in common")
+
+    for label, metric, before, after, change, regressed in rows:
+        print(f"{'REGRESSED' if regressed else 'ok':<10} {label:<70} {metric:<17} "
+              f"{before:12.3f} -> {after:12.3f} ({change:+.1%})")
+    print(f"{regressions} regression(s) in {len(rows)} comparisons")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Closed-loop HTTP load generator for the auth, crop and disease services.
+
+Every scenario runs at each --concurrency level. N threads, each with its
+own keep-alive session, send requests back to back for --duration
+seconds, after --warmup seconds that are not counted.
+
+  recommend  POST /recommend with varied soil/weather inputs (crop)
+  predict    POST /predict with a JPEG upload (disease)
+  login      POST /login as one of --users pre-registered accounts (auth)
+  register   POST /register with a new email every time (auth)
+
+The report has throughput (2xx responses per second), latency
+percentiles of the 2xx responses, and counts per status code (e.g. 503s
+shed by admission control).
+
+Against running services (auth needs RATELIMIT_ENABLED=0 or the login and
+register limits will answer 429):
+
+    python load_test.py --crop-url http://localhost:7861 --scenarios recommend --concurrency 1,8,32
+
+Or fully local: the Supabase stub runs in this process and the services
+start as subprocesses on free ports, the same way their Dockerfiles run
+them:
+
+    python load_test.py --local --duration 20 --output results/load-baseline.json
+    python compare_reports.py results/load-baseline.json results/load-candidate.json
+"""
+import argparse
+import contextlib
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+
+sys.path.insert(0, HERE)
+
+from bench_models import crop_inputs, synthetic_jpeg
+from bench_report import latency_summary, write_report
+from supabase_stub import start_stub
+
+SCENARIOS = ('recommend', 'predict', 'login', 'register')
+SCENARIO_SERVICE = {'recommend': 'crop', 'predict': 'disease', 'login': 'auth', 'register': 'auth'}
+PASSWORD = 'load-test-password'
+
+# service -> (directory, command, readiness path) for --local
+LOCAL_SERVICES = {
+    'auth': ('flora-auth', [sys.executable, 'app.py'], '/health'),
+    'crop': ('Crop-Recommendation-deployment', ['gunicorn', '-c', 'gunicorn.conf.py', 'app_crop:app'], '/health/ready'),
+    'disease': ('plant-disease-detection', ['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], '/health/ready')
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalStack:
+    """Supabase stub plus the services the scenarios need, on free ports"""
+
+    def __init__(self, services, startup_timeout):
+        self.startup_timeout = startup_timeout
+        self.processes = {}
+        self.logs = {}
+        self.urls = {}
+        self.stub = None
+        self.services = services
+
+    def __enter__(self):
+        env = dict(os.environ)
+        if 'auth' in self.services:
+            self.stub, _, stub_url = start_stub()
+            env.update({
+                'SUPABASE_URL': stub_url,
+                'SUPABASE_ANON_KEY': 'stub-key',
+                'JWT_SECRET': env.get('JWT_SECRET', 'load-test-secret'),
+                'RATELIMIT_ENABLED': '0'
+            })
+        for service in self.services:
+            directory, command, _ = LOCAL_SERVICES[service]
+            port = free_port()
+            self.logs[service] = tempfile.NamedTemporaryFile(prefix=f'flora-{service}-', suffix='.log', delete=False)
+            self.processes[service] = subprocess.Popen(
+                command, cwd=os.path.join(BACKEND_DIR, directory), env=dict(env, PORT=str(port)),
+                stdout=self.logs[service], stderr=subprocess.STDOUT
+            )
+            self.urls[service] = f"http://127.0.0.1:{port}"
+        try:
+            for service in self.services:
+                self._wait_ready(service)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_ready(self, service):
+        path = LOCAL_SERVICES[service][2]
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.processes[service].poll() is not None:
+                break
+            try:
+                if requests.get(self.urls[service] + path, timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise SystemExit(f"{service} did not become ready; see {self.logs[service].name}")
+
+    def __exit__(self, *exc_info):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for log in self.logs.values():
+            log.close()
+        if self.stub is not None:
+            self.stub.shutdown()
+
+
+def make_scenario(name, url, args):
+    """(request function taking a session, params recorded with the result)"""
+    if name == 'recommend':
+        rows = crop_inputs(1000)
+        counter = itertools.count()
+        endpoint = url + '/recommend' + (f"?explain={args.explain}" if args.explain else '')
+        params = {"explain": args.explain or "service default"}
+        return lambda session: session.post(endpoint, json=rows[next(counter) % len(rows)], timeout=args.timeout), params
+
+    if name == 'predict':
+        if args.image:
+            with open(args.image, 'rb') as f:
+                image = f.read()
+        else:
+            image = synthetic_jpeg(1024, 768)
+        params = {"image_kb": len(image) // 1024}
+        return lambda session: session.post(
+            url + '/predict', files={'file': ('leaf.jpg', image, 'image/jpeg')}, timeout=args.timeout
+        ), params
+
+    run_id = uuid.uuid4().hex[:8]
+    counter = itertools.count()
+
+    if name == 'register':
+        def register(session):
+            email = f"load-{run_id}-{next(counter)}@example.com"
+            return session.post(url + '/register', json={
+                "email": email, "password": PASSWORD, "full_name": "Load Test"
+            }, timeout=args.timeout)
+        return register, {}
+
+    emails = [f"load-{run_id}-user{i}@example.com" for i in range(args.users)]
+    with requests.Session() as session:
+        for email in emails:
+            response = session.post(url + '/register', json={
+                "email": email, "password": PASSWORD, "full_name": "Load Test"
+            }, timeout=args.timeout)
+            if response.status_code not in (200, 201):
+                raise SystemExit(f"Registering login users failed: {response.status_code} {response.text[:200]}")
+    return lambda session: session.post(url + '/login', json={
+        "email": emails[next(counter) % len(emails)], "password": PASSWORD
+    }, timeout=args.timeout), {"users": len(emails)}
+
+
+def run_level(send, concurrency, warmup, duration):
+    """Drive `send` from `concurrency` threads; (latencies of 2xx responses, status counts)"""
+    measure_start = time.perf_counter() + warmup
+    end = measure_start + duration
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        local_latencies = []
+        local_statuses = Counter()
+        with requests.Session() as session:
+            while True:
+                start = time.perf_counter()
+                if start >= end:
+                    break
+                try:
+                    status = str(send(session).status_code)
+                except requests.RequestException as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+                if start >= measure_start:
+                    local_statuses[status] += 1
+                    if status.startswith('2'):
+                        local_latencies.append(elapsed)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated levels")
+    parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per level")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Uncounted seconds before measuring")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument('--local', action='store_true', help="Start the stub and services locally")
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--auth-url')
+    parser.add_argument('--crop-url')
+    parser.add_argument('--disease-url')
+    parser.add_argument('--explain', default=None, help="explain mode for recommend (none, fast, full)")
+    parser.add_argument('--image', default=None, help="JPEG for predict; a synthetic 1024x768 image otherwise")
+    parser.add_argument('--users', type=int, default=20, help="Accounts the login scenario cycles through")
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', 'load_test.json'))
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+    services = sorted({SCENARIO_SERVICE[name] for name in scenarios})
+
+    given = {'auth': args.auth_url, 'crop': args.crop_url, 'disease': args.disease_url}
+    missing = [service for service in services if not given[service]]
+    if missing and not args.local:
+        parser.error("--local or " + ", ".join(f"--{service}-url" for service in missing) + " is required")
+
+    results = []
+    with LocalStack(services, args.startup_timeout) if args.local else contextlib.nullcontext() as stack:
+        urls = stack.urls if args.local else {service: given[service].rstrip('/') for service in services}
+
+        for name in scenarios:
+            send, params = make_scenario(name, urls[SCENARIO_SERVICE[name]], args)
+            for concurrency in levels:
+                latencies, statuses = run_level(send, concurrency, args.warmup, args.duration)
+                total = sum(statuses.values())
+                ok = len(latencies)
+                result = {
+                    "name": f"http.{name}",
+                    "params": {"concurrency": concurrency, **params},
+                    "requests": total,
+                    "status_counts": dict(statuses),
+                    "error_rate": (total - ok) / total if total else 0.0,
+                    "throughput_per_s": ok / args.duration,
+                    **latency_summary(latencies)
+                }
+                results.append(result)
+                p50 = f"{result['p50_ms']:.1f}ms" if ok else "-"
+                p99 = f"{result['p99_ms']:.1f}ms" if ok else "-"
+                print(f"{name:<10} c={concurrency:<4} {result['throughput_per_s']:8.1f} req/s "
+                      f"p50={p50:<10} p99={p99:<10} statuses={dict(statuses)}")
+
+    write_report(args.output, "load_test", results, duration_s=args.duration, warmup_s=args.warmup,
+                 local=args.local)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""In-memory stand-in for the Supabase REST API used by flora-auth.
+
+Implements just what app.py calls: the `users` table (GET by email,
+POST, PATCH by id) and `GET /rest/v1/` for the health check. It speaks
+HTTP/1.1 keep-alive. --connect-delay-ms is charged once per new connection
+to stand in for the TCP+TLS handshake of the real service, and
+--latency-ms is charged per request.
+
+    python supabase_stub.py --port 54321 --connect-delay-ms 40 --latency-ms 5
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_ANON_KEY=stub python ../flora-auth/app.py
+"""
+import argparse
+import itertools
+import json
+import socket
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubState:
+    def __init__(self, connect_delay=0.0, latency=0.0):
+        self.connect_delay = connect_delay
+        self.latency = latency
+        self.users = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+
+def _eq_filter(query, field):
+    """Value of a PostgREST `field=eq.value` filter"""
+    values = parse_qs(query).get(field)
+    if values and values[0].startswith('eq.'):
+        return values[0][3:]
+    return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; don't let Nagle hold the body back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.state.lock:
+            self.state.connections += 1
+        time.sleep(self.state.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _begin(self):
+        with self.state.lock:
+            self.state.requests += 1
+        time.sleep(self.state.latency)
+        return urlsplit(self.path)
+
+    def do_GET(self):
+        url = self._begin()
+        if url.path.rstrip('/') == '/rest/v1':
+            return self._send(200, {})
+        if url.path != '/rest/v1/users':
+            return self._send(404, {"message": "not found"})
+        email = _eq_filter(url.query, 'email')
+        with self.state.lock:
+            user = self.state.users.get(email)
+        self._send(200, [user] if user else [])
+
+    def do_POST(self):
+        url = self._begin()
+        if url.path != '/rest/v1/users':
+            return self._send(404, {"message": "not found"})
+        data = self._read_json()
+        with self.state.lock:
+            if data['email'] in self.state.users:
+                return self._send(409, {"message": "duplicate key value violates unique constraint"})
+            user = {
+                "id": next(self.state.ids),
+                "email": data['email'],
+                "password_hash": data['password_hash'],
+                "full_name": data.get('full_name', ''),
+                "created_at": datetime.utcnow().isoformat(),
+                "last_login": None
+            }
+            self.state.users[user['email']] = user
+        self._send(201, [user])
+
+    def do_PATCH(self):
+        url = self._begin()
+        user_id = _eq_filter(url.query, 'id')
+        data = self._read_json()
+        with self.state.lock:
+            updated = [u for u in self.state.users.values() if str(u['id']) == user_id]
+            for user in updated:
+                user.update(data)
+        self._send(200, updated)
+
+
+def start_stub(host='127.0.0.1', port=0, connect_delay_ms=0.0, latency_ms=0.0):
+    """Start the stub on a background thread; returns (server, state, base_url)"""
+    state = StubState(connect_delay_ms / 1000.0, latency_ms / 1000.0)
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Supabase REST stub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--connect-delay-ms', type=float, default=0.0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub(args.host, args.port, args.connect_delay_ms, args.latency_ms)
+    print(f"Supabase stub listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,30 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import bcrypt
 import jwt
 from datetime import datetime, timedelta
 import os
+import sys
 from dotenv import load_dotenv
 import requests
 import json
+import logging
+
+from flora_common.service_metrics import ServiceMetrics
+from flora_common.structured_logging import configure_logging, logging_stats
+
+from supabase_client import SupabaseClient
+from password_hasher import PasswordHasher, HasherBusyError
+from token_auth import TokenVerifier, bearer_token
+from user_cache import UserCache, MISSING
+import rate_limit_storage  # registers the sqlite:// limits storage
 
 load_dotenv()
 
+# JSON lines written off the request thread, with passwords/tokens redacted
+configure_logging('auth')
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 # Configure CORS
@@ -20,30 +34,83 @@ CORS(app, origins=[
     'https://*.vercel.app'
 ], supports_credentials=True)
 
-# Rate limiting
+# Rate limiting. memory:// is per process; use sqlite:////<absolute path>
+# (sqlite:///<path> is relative to the working directory) or redis:// so
+# that all workers share one set of counters
+RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'fixed-window')
+# RATELIMIT_ENABLED=0 turns limits off, e.g. for load tests from one address
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+app.config['RATELIMIT_ENABLED'] = RATELIMIT_ENABLED
+
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
-    storage_uri="memory://"
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy=RATELIMIT_STRATEGY
 )
 
 # Supabase Configuration - مع تنظيف المسافات
 SUPABASE_URL = os.environ.get('SUPABASE_URL', '').strip()  # تنظيف المسافات
 SUPABASE_KEY = os.environ.get('SUPABASE_ANON_KEY', '').strip()  # تنظيف المسافات
 JWT_SECRET = os.environ.get('JWT_SECRET', 'fallback-secret-key').strip()
+EXPECTED_SUPABASE_URL = 'https://onnbpuqxtmdddbksfgrt.supabase.co'
 
-print("🌿 Flora Auth API Starting...")
-print(f"SUPABASE_URL: '{SUPABASE_URL}'")
-print(f"SUPABASE_URL length: {len(SUPABASE_URL)}")
-print(f"SUPABASE_KEY loaded: {bool(SUPABASE_KEY)}")
+# Shared keep-alive connection pool for all Supabase calls
+supabase = SupabaseClient(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    pool_size=int(os.environ.get('SUPABASE_POOL_SIZE', 10)),
+    retries=int(os.environ.get('SUPABASE_RETRIES', 3)),
+    backoff=float(os.environ.get('SUPABASE_RETRY_BACKOFF', 0.2)),
+    timeout=float(os.environ.get('SUPABASE_TIMEOUT', 10))
+)
+
+# bcrypt runs on a bounded pool; excess logins get a fast 503 instead of queueing
+hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+    workers=int(os.environ.get('AUTH_HASH_WORKERS', os.cpu_count() or 1)),
+    max_pending=int(os.environ.get('AUTH_HASH_MAX_PENDING', 4 * (os.cpu_count() or 1))),
+    timeout=float(os.environ.get('AUTH_HASH_TIMEOUT', 30))
+)
+
+# Decoded claims of recently seen tokens, dropped at each token's exp
+verifier = TokenVerifier(JWT_SECRET, max_entries=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)))
+
+# email -> user row (or "not found"), invalidated by create_user/update_last_login.
+# Per process: with several workers a "not found" cached by one outlives a
+# registration on another for up to USER_CACHE_NEGATIVE_TTL seconds.
+user_cache = UserCache(
+    max_entries=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 30)),
+    negative_ttl=float(os.environ.get('USER_CACHE_NEGATIVE_TTL', 2))
+)
+
+# Request counts and latencies per route plus Supabase/bcrypt timings, served at /metrics
+metrics = ServiceMetrics('auth')
+metrics.instrument_flask(app)
+supabase.stage_observer = metrics.observe_stage
+hasher.stage_observer = metrics.observe_stage
+
+logger.info("Flora Auth API starting", extra={'fields': {
+    'supabase_url': SUPABASE_URL,
+    'supabase_url_length': len(SUPABASE_URL),
+    'supabase_key_loaded': bool(SUPABASE_KEY)
+}})
 
 def hash_password(password):
     """Hash password"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return hasher.hash(password)
 
 def verify_password(password, hashed):
     """Verify password"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return hasher.verify(password, hashed)
+
+def busy_response():
+    """503 returned when the bcrypt pool is saturated or a hash timed out"""
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 def create_token(user_id, email):
     """Create JWT token"""
@@ -61,31 +128,22 @@ def supabase_request(endpoint, method='GET', data=None):
     # تنظيف الـ URL من أي مسافات
     base_url = SUPABASE_URL.strip()
     if not base_url:
-        print("❌ SUPABASE_URL is empty!")
+        logger.error("SUPABASE_URL is empty")
         return None
         
-    url = f"{base_url}/rest/v1/{endpoint}"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=representation'
-    }
-    
-    print(f"🔧 Making {method} request to: {url}")
+    table = endpoint.split('?')[0]
     
     try:
-        if method == 'GET':
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method == 'POST':
-            response = requests.post(url, headers=headers, json=data, timeout=10)
-        elif method == 'PATCH':
-            response = requests.patch(url, headers=headers, json=data, timeout=10)
+        response = supabase.request(method, f"rest/v1/{endpoint}", data=data)
         
-        print(f"🔧 Response status: {response.status_code}")
+        logger.debug("Supabase request", extra={'fields': {
+            'method': method, 'table': table, 'status': response.status_code
+        }})
         
         if response.status_code >= 400:
-            print(f"❌ API Error {response.status_code}: {response.text}")
+            logger.warning("Supabase API error", extra={'fields': {
+                'method': method, 'table': table, 'status': response.status_code, 'body': response.text[:500]
+            }})
             return None
         
         # Handle empty response
@@ -95,13 +153,30 @@ def supabase_request(endpoint, method='GET', data=None):
         return response.json()
         
     except requests.exceptions.RequestException as e:
-        print(f"❌ Request error: {e}")
+        logger.error("Supabase request failed", extra={'fields': {'method': method, 'table': table, 'error': str(e)}})
+        return None
+
+def cached_user_lookup(email):
+    """Cached result of get_user_by_email as a list, or None on a cache miss"""
+    user = user_cache.get(email)
+    if user is MISSING:
         return None
+    return [user] if user is not None else []
+
+def cache_user_lookup(email, users):
+    """Remember a successful lookup (an empty list is cached as "not found")"""
+    if users is not None:
+        user_cache.put(email, users[0] if users else None)
 
 def get_user_by_email(email):
     """Get user by email"""
+    cached = cached_user_lookup(email)
+    if cached is not None:
+        return cached
     endpoint = f"users?email=eq.{email}"
-    return supabase_request(endpoint)
+    users = supabase_request(endpoint)
+    cache_user_lookup(email, users)
+    return users
 
 def create_user(email, password_hash, full_name):
     """Create new user"""
@@ -111,13 +186,19 @@ def create_user(email, password_hash, full_name):
         'password_hash': password_hash,
         'full_name': full_name
     }
-    return supabase_request(endpoint, 'POST', data)
+    try:
+        return supabase_request(endpoint, 'POST', data)
+    finally:
+        user_cache.invalidate(email)
 
 def update_last_login(user_id):
     """Update user's last login"""
     endpoint = f"users?id=eq.{user_id}"
     data = {'last_login': datetime.utcnow().isoformat()}
-    return supabase_request(endpoint, 'PATCH', data)
+    try:
+        return supabase_request(endpoint, 'PATCH', data)
+    finally:
+        user_cache.invalidate_id(user_id)
 
 # Root endpoint
 @app.route('/', methods=['GET'])
@@ -137,9 +218,7 @@ def home():
 def health():
     try:
         # Test basic Supabase connection
-        test_url = f"{SUPABASE_URL.strip()}/rest/v1/"
-        headers = {'apikey': SUPABASE_KEY}
-        response = requests.get(test_url, headers=headers, timeout=5)
+        response = supabase.request('GET', "rest/v1/", timeout=5)
         
         if response.status_code == 200:
             db_status = 'connected'
@@ -153,7 +232,12 @@ def health():
         'status': 'healthy',
         'service': 'Flora Auth',
         'database': db_status,
-        'supabase_url_clean': SUPABASE_URL.strip() == 'https://onnbpuqxtmdddbksfgrt.supabase.co'
+        'supabase_latency': supabase.stats(),
+        'password_hasher': hasher.stats(),
+        'token_cache': verifier.stats(),
+        'user_cache': user_cache.stats(),
+        'logging': logging_stats(),
+        'supabase_url_clean': SUPABASE_URL.strip() == EXPECTED_SUPABASE_URL
     })
 
 # Register endpoint
@@ -162,7 +246,7 @@ def health():
 def register():
     try:
         data = request.json
-        print(f"📥 Register request: {data}")
+        logger.debug("Register request", extra={'fields': {'body': data}})
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
@@ -179,7 +263,6 @@ def register():
         
         # Check if user exists
         existing_users = get_user_by_email(email)
-        print(f"🔍 Existing users check: {existing_users}")
         
         if existing_users and len(existing_users) > 0:
             return jsonify({'error': 'Email already registered'}), 400
@@ -187,7 +270,7 @@ def register():
         # Create user
         password_hash = hash_password(password)
         new_user = create_user(email, password_hash, full_name)
-        print(f"🔧 Create user result: {new_user}")
+        logger.debug("Create user result", extra={'fields': {'rows': new_user}})
         
         if not new_user or len(new_user) == 0:
             return jsonify({'error': 'Failed to create user. Please check RLS policies.'}), 500
@@ -207,8 +290,10 @@ def register():
             }
         }), 201
     
+    except HasherBusyError:
+        return busy_response()
     except Exception as e:
-        print(f"❌ Registration error: {e}")
+        logger.exception("Registration failed")
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
 
 # Login endpoint
@@ -252,10 +337,52 @@ def login():
             }
         })
     
+    except HasherBusyError:
+        return busy_response()
     except Exception as e:
-        print(f"❌ Login error: {e}")
+        logger.exception("Login failed")
         return jsonify({'error': 'Login failed', 'details': str(e)}), 500
 
+def body_token(data):
+    """The token of a {"token": ...} /verify body: '' if absent, None if the body is malformed"""
+    if data is None:
+        return ''
+    if not isinstance(data, dict):
+        return None
+    token = data.get('token', '')
+    return token.strip() if isinstance(token, str) else None
+
+def verify_result(token):
+    """(body, status) for a /verify request carrying `token` (None: malformed body)"""
+    if token is None:
+        return {'valid': False, 'error': 'Expected a JSON object with a string token'}, 400
+    if not token:
+        return {'valid': False, 'error': 'Token required'}, 400
+    try:
+        claims = verifier.verify(token)
+    except jwt.ExpiredSignatureError:
+        return {'valid': False, 'error': 'Token expired'}, 401
+    except jwt.InvalidTokenError:
+        return {'valid': False, 'error': 'Invalid token'}, 401
+
+    return {
+        'valid': True,
+        'user': {
+            'id': claims.get('user_id'),
+            'email': claims.get('email')
+        },
+        'expires_at': claims['exp']
+    }, 200
+
+# Verify endpoint: token from the Authorization header or {"token": ...}
+@app.route('/verify', methods=['GET', 'POST'])
+def verify():
+    token = bearer_token(request.headers)
+    if token is None:
+        token = body_token(request.get_json(silent=True))
+    body, status = verify_result(token)
+    return jsonify(body), status
+
 # Test endpoint جديد
 @app.route('/test-config', methods=['GET'])
 def test_config():
@@ -265,10 +392,18 @@ def test_config():
         'supabase_url_clean': SUPABASE_URL.strip(),
         'supabase_url_length': len(SUPABASE_URL),
         'supabase_key_exists': bool(SUPABASE_KEY),
-        'expected_url': 'https://onnbpuqxtmdddbksfgrt.supabase.co',
-        'urls_match': SUPABASE_URL.strip() == 'https://onnbpuqxtmdddbksfgrt.supabase.co'
+        'expected_url': EXPECTED_SUPABASE_URL,
+        'urls_match': SUPABASE_URL.strip() == EXPECTED_SUPABASE_URL
     })
 
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 7860))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    if os.environ.get('AUTH_SERVER_MODE', 'sync') == 'async':
+        # async_app does `from app import ...`; point that at this module so
+        # the Flask app, bcrypt pool, Supabase session and limiter storage
+        # aren't built a second time under the name "app"
+        sys.modules.setdefault('app', sys.modules[__name__])
+        import async_app
+        async_app.main()
+    else:
+        port = int(os.environ.get('PORT', 7860))
+        app.run(host='0.0.0.0', port=port, debug=False)
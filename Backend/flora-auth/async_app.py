@@ -0,0 +1,340 @@
+"""asyncio serving mode for Flora Auth.
+
+Same routes and JSON responses as app.py, served by aiohttp on a single
+event loop. Supabase calls use a pooled aiohttp client, bcrypt runs on
+the shared PasswordHasher pool, and the last-login PATCH is sent in the
+background so it doesn't add to login latency.
+
+    python async_app.py            # or AUTH_SERVER_MODE=async python app.py
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+
+from aiohttp import web
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+from app import (
+    SUPABASE_URL, SUPABASE_KEY, hasher, create_token, verifier, body_token, verify_result,
+    user_cache, cached_user_lookup, cache_user_lookup, HasherBusyError, EXPECTED_SUPABASE_URL,
+    RATELIMIT_ENABLED, RATELIMIT_STORAGE_URI, RATELIMIT_STRATEGY, metrics
+)
+from flora_common.structured_logging import logging_stats
+from supabase_client import AsyncSupabaseClient
+from token_auth import bearer_token
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ORIGINS = re.compile(r'^(http://localhost:3000|https://.*\.vercel\.app)$')
+
+rate_limiter = STRATEGIES[RATELIMIT_STRATEGY](storage_from_string(RATELIMIT_STORAGE_URI))
+rate_limit_enabled = RATELIMIT_ENABLED
+# Shared storages (sqlite://, redis://) do blocking I/O, and sqlite may wait
+# up to its busy timeout for the write lock: hit them off the event loop.
+# memory:// takes microseconds, less than handing off to a thread.
+rate_limit_offloaded = not RATELIMIT_STORAGE_URI.startswith('memory://')
+REGISTER_LIMIT = parse("5 per hour")
+LOGIN_LIMIT = parse("10 per minute")
+
+supabase = AsyncSupabaseClient(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    pool_size=int(os.environ.get('SUPABASE_POOL_SIZE', 10)),
+    retries=int(os.environ.get('SUPABASE_RETRIES', 3)),
+    backoff=float(os.environ.get('SUPABASE_RETRY_BACKOFF', 0.2)),
+    timeout=float(os.environ.get('SUPABASE_TIMEOUT', 10))
+)
+supabase.stage_observer = metrics.observe_stage
+
+# Strong references to in-flight background writes (the loop only keeps weak ones)
+background_tasks = set()
+
+
+async def supabase_request(endpoint, method='GET', data=None):
+    """Make request to Supabase REST API"""
+    if not SUPABASE_URL:
+        logger.error("SUPABASE_URL is empty")
+        return None
+
+    table = endpoint.split('?')[0]
+    try:
+        status, body = await supabase.request(method, f"rest/v1/{endpoint}", data=data)
+    except Exception as e:
+        logger.error("Supabase request failed", extra={'fields': {'method': method, 'table': table, 'error': str(e)}})
+        return None
+
+    logger.debug("Supabase request", extra={'fields': {'method': method, 'table': table, 'status': status}})
+    if status >= 400:
+        logger.warning("Supabase API error", extra={'fields': {
+            'method': method, 'table': table, 'status': status, 'body': str(body)[:500]
+        }})
+        return None
+    return body if body is not None else []
+
+
+async def get_user_by_email(email):
+    """Get user by email"""
+    cached = cached_user_lookup(email)
+    if cached is not None:
+        return cached
+    users = await supabase_request(f"users?email=eq.{email}")
+    cache_user_lookup(email, users)
+    return users
+
+
+async def create_user(email, password_hash, full_name):
+    """Create new user"""
+    data = {
+        'email': email,
+        'password_hash': password_hash,
+        'full_name': full_name
+    }
+    try:
+        return await supabase_request("users", 'POST', data)
+    finally:
+        user_cache.invalidate(email)
+
+
+async def update_last_login(user_id):
+    """Update user's last login"""
+    data = {'last_login': datetime.utcnow().isoformat()}
+    try:
+        return await supabase_request(f"users?id=eq.{user_id}", 'PATCH', data)
+    finally:
+        user_cache.invalidate_id(user_id)
+
+
+def spawn(coro):
+    """Run `coro` in the background without awaiting it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def json_error(message, status, **extra):
+    return web.json_response({'error': message, **extra}, status=status)
+
+
+def busy_response():
+    """503 returned when the bcrypt pool is saturated or a hash timed out"""
+    return web.json_response(
+        {'error': 'Server busy, please retry shortly'}, status=503, headers={'Retry-After': '1'}
+    )
+
+
+def rate_limited(limit, scope):
+    """Per-client-address limit, matching the flask-limiter decorators in app.py"""
+    def decorator(handler):
+        async def wrapper(request):
+            if rate_limit_enabled:
+                identifiers = (limit, scope, request.remote or '')
+                if rate_limit_offloaded:
+                    allowed = await asyncio.to_thread(rate_limiter.hit, *identifiers)
+                else:
+                    allowed = rate_limiter.hit(*identifiers)
+                if not allowed:
+                    return json_error(f"{limit}", 429)
+            return await handler(request)
+        return wrapper
+    return decorator
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    origin = request.headers.get('Origin', '')
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', '*'
+        )
+    else:
+        response = await handler(request)
+
+    if ALLOWED_ORIGINS.match(origin):
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Vary'] = 'Origin'
+    return response
+
+
+async def home(request):
+    return web.json_response({
+        'message': 'Flora Authentication API 🌿',
+        'version': '1.0.0',
+        'status': 'running',
+        'config': {
+            'supabase_url_configured': bool(SUPABASE_URL),
+            'supabase_key_configured': bool(SUPABASE_KEY)
+        }
+    })
+
+
+async def health(request):
+    try:
+        status, _ = await supabase.request('GET', "rest/v1/", timeout=5)
+        db_status = 'connected' if status == 200 else f'error: {status}'
+    except Exception as e:
+        db_status = f'error: {str(e)}'
+
+    return web.json_response({
+        'status': 'healthy',
+        'service': 'Flora Auth',
+        'database': db_status,
+        'supabase_latency': supabase.stats(),
+        'password_hasher': hasher.stats(),
+        'token_cache': verifier.stats(),
+        'user_cache': user_cache.stats(),
+        'logging': logging_stats(),
+        'supabase_url_clean': SUPABASE_URL == EXPECTED_SUPABASE_URL
+    })
+
+
+def user_payload(user, token):
+    return {
+        'success': True,
+        'token': token,
+        'user': {
+            'id': str(user['id']),
+            'email': user['email'],
+            'full_name': user['full_name']
+        }
+    }
+
+
+@rate_limited(REGISTER_LIMIT, 'register')
+async def register(request):
+    try:
+        data = await read_json(request)
+        if not data:
+            return json_error('No data provided', 400)
+
+        email = data.get('email', '').strip().lower()
+        password = data.get('password', '')
+        full_name = data.get('full_name', '').strip()
+
+        if not email or not password:
+            return json_error('Email and password required', 400)
+
+        if len(password) < 6:
+            return json_error('Password must be at least 6 characters', 400)
+
+        existing_users = await get_user_by_email(email)
+        if existing_users and len(existing_users) > 0:
+            return json_error('Email already registered', 400)
+
+        password_hash = await hasher.hash_async(password)
+        new_user = await create_user(email, password_hash, full_name)
+
+        if not new_user or len(new_user) == 0:
+            return json_error('Failed to create user. Please check RLS policies.', 500)
+
+        user = new_user[0]
+        return web.json_response(user_payload(user, create_token(user['id'], user['email'])), status=201)
+
+    except HasherBusyError:
+        return busy_response()
+    except Exception as e:
+        logger.exception("Registration failed")
+        return json_error('Registration failed', 500, details=str(e))
+
+
+@rate_limited(LOGIN_LIMIT, 'login')
+async def login(request):
+    try:
+        data = await read_json(request)
+        if not data:
+            return json_error('No data provided', 400)
+
+        email = data.get('email', '').strip().lower()
+        password = data.get('password', '')
+
+        if not email or not password:
+            return json_error('Email and password required', 400)
+
+        users = await get_user_by_email(email)
+        if not users or len(users) == 0:
+            return json_error('Invalid email or password', 401)
+
+        user = users[0]
+
+        if not await hasher.verify_async(password, user['password_hash']):
+            return json_error('Invalid email or password', 401)
+
+        # The response doesn't depend on this write, so don't wait for it
+        spawn(update_last_login(user['id']))
+
+        return web.json_response(user_payload(user, create_token(user['id'], user['email'])))
+
+    except HasherBusyError:
+        return busy_response()
+    except Exception as e:
+        logger.exception("Login failed")
+        return json_error('Login failed', 500, details=str(e))
+
+
+async def verify(request):
+    token = bearer_token(request.headers)
+    if token is None:
+        token = body_token(await read_json(request) if request.can_read_body else None)
+    body, status = verify_result(token)
+    return web.json_response(body, status=status)
+
+
+async def test_config(request):
+    """Test configuration details"""
+    return web.json_response({
+        'supabase_url_raw': SUPABASE_URL,
+        'supabase_url_clean': SUPABASE_URL.strip(),
+        'supabase_url_length': len(SUPABASE_URL),
+        'supabase_key_exists': bool(SUPABASE_KEY),
+        'expected_url': EXPECTED_SUPABASE_URL,
+        'urls_match': SUPABASE_URL.strip() == EXPECTED_SUPABASE_URL
+    })
+
+
+async def on_startup(app):
+    await supabase.start()
+
+
+async def on_cleanup(app):
+    # Let pending last-login writes finish before the session closes
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    await supabase.close()
+
+
+def create_app():
+    app = web.Application(middlewares=[metrics.aiohttp_middleware(), cors_middleware])
+    app.router.add_get('/', home)
+    app.router.add_get('/health', health)
+    app.router.add_post('/register', register)
+    app.router.add_post('/login', login)
+    app.router.add_get('/verify', verify)
+    app.router.add_post('/verify', verify)
+    app.router.add_get('/test-config', test_config)
+    app.router.add_get('/metrics', metrics.aiohttp_handler)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    port = int(os.environ.get('PORT', 7860))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
+
+
+if __name__ == '__main__':
+    main()
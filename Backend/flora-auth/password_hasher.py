@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import bcrypt
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when the bcrypt pool already has `max_pending` jobs queued or running"""
+
+
+class HasherTimeoutError(HasherBusyError):
+    """Raised when a job waited longer than `timeout`; the pool is overloaded all the same"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool instead of the request thread.
+
+    bcrypt releases the GIL while it hashes, so a thread pool spreads the
+    work over `workers` cores. Admission is capped at `max_pending` jobs.
+    Past that, calls fail fast with HasherBusyError, so a login burst is
+    shed as 503s and does not build an unbounded queue.
+    """
+
+    def __init__(self, rounds=12, workers=4, max_pending=16, timeout=30):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.busy_seconds = 0.0
+        # Called with ('bcrypt', seconds) after every hash or verify
+        self.stage_observer = None
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusyError("Password hashing pool is saturated")
+        with self._lock:
+            self.pending += 1
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def _submit(self, fn, *args):
+        """Admit and queue one job; its slot is freed when the job finishes.
+
+        Not when the caller stops waiting: a timed-out bcrypt call keeps a
+        worker busy, so it keeps counting towards `max_pending` until it
+        returns (or is cancelled before it started).
+        """
+        self._admit()
+        try:
+            future = self._executor.submit(self._timed, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, fn, *args):
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            # Still queued: don't spend a worker on a result nobody reads
+            future.cancel()
+            raise self._timed_out() from None
+
+    async def _run_async(self, fn, *args):
+        # wait_for cancels the wrapped future on timeout, which cancels the
+        # job if it hasn't started yet
+        future = asyncio.wrap_future(self._submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+    def _timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+        return HasherTimeoutError(f"Password hashing took longer than {self.timeout}s")
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.completed += 1
+                self.busy_seconds += elapsed
+            if self.stage_observer is not None:
+                self.stage_observer('bcrypt', elapsed)
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, hashed):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    async def hash_async(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = await self._run_async(bcrypt.hashpw, password.encode('utf-8'), salt)
+        return hashed.decode('utf-8')
+
+    async def verify_async(self, password, hashed):
+        return await self._run_async(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_ms": 1000 * self.busy_seconds / self.completed if self.completed else 0.0
+            }
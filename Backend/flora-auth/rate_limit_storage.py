@@ -0,0 +1,183 @@
+"""SQLite-file storage backend for flask-limiter / limits.
+
+Importing this module registers the ``sqlite://`` scheme, so every worker
+on a host can share one set of counters with no external service:
+
+    RATELIMIT_STORAGE_URI=sqlite:////tmp/flora-ratelimit.db
+    RATELIMIT_STRATEGY=sliding-window-counter
+
+As with SQLAlchemy, three slashes give a path relative to the working
+directory (sqlite:///flora-ratelimit.db) and four an absolute one.
+
+Any other limits URI (memory://, redis://, ...) keeps working unchanged.
+"""
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+
+
+def sqlite_path(uri):
+    """Database path of a sqlite:///relative or sqlite:////absolute URI"""
+    path = uri.split('://', 1)[1].split('?', 1)[0]
+    # sqlite://name has no separating slash; sqlite:// has no path at all.
+    # Either would otherwise open a private database per connection, so
+    # workers would silently stop sharing counters.
+    if not path.startswith('/') or len(path) == 1:
+        raise ValueError(f"Expected sqlite:///<relative path> or sqlite:////<absolute path>, got {uri!r}")
+    return path[1:]
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport):
+    """Fixed-window and sliding-window-counter limits in one SQLite table.
+
+    Each limit window is one (key, count, expires_at) row. The sliding
+    window keeps two such counters per client and limit, the current and
+    the previous window, instead of a timestamp per request. The file is
+    in WAL mode, and each check-and-increment runs in a BEGIN IMMEDIATE
+    transaction, so it is atomic across processes. Expired rows are
+    swept every `sweep_interval` seconds.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, sweep_interval=30, timeout=5, **options):
+        self.path = sqlite_path(uri) if uri else ':memory:'
+        self.sweep_interval = float(sweep_interval)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._db = sqlite3.connect(
+            self.path, timeout=float(timeout), check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counters "
+            "(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    # --- helpers (caller holds self._lock) ---
+
+    def _count(self, key, now):
+        row = self._db.execute(
+            "SELECT count FROM counters WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _incr(self, key, expiry, amount, now):
+        self._db.execute(
+            "INSERT INTO counters (key, count, expires_at) VALUES (?1, ?2, ?3) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "count = CASE WHEN expires_at <= ?4 THEN ?2 ELSE count + ?2 END, "
+            "expires_at = CASE WHEN expires_at <= ?4 THEN ?3 ELSE expires_at END",
+            (key, amount, now + expiry, now)
+        )
+        return self._count(key, now)
+
+    def _maybe_sweep(self, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self._db.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    # --- fixed window ---
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        with self._lock:
+            self._transaction()
+            try:
+                count = self._incr(key, expiry, amount, now)
+                self._maybe_sweep(now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return count
+
+    def get(self, key):
+        with self._lock:
+            return self._count(key, time.time())
+
+    def get_expiry(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row[0] if row else now
+
+    def clear(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def check(self):
+        try:
+            with self._lock:
+                self._db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._lock:
+            return self._db.execute("DELETE FROM counters").rowcount
+
+    # --- sliding window counter ---
+
+    @staticmethod
+    def _window_keys(key, expiry, now):
+        window = int(now // expiry)
+        return f"{key}/{window - 1}", f"{key}/{window}", (window + 1) * expiry
+
+    def _window_info(self, key, expiry, now):
+        previous_key, current_key, window_end = self._window_keys(key, expiry, now)
+        previous_count = self._count(previous_key, now)
+        current_count = self._count(current_key, now)
+        # The previous window's weight shrinks linearly to 0 by the end of this one
+        previous_ttl = window_end - now if previous_count else 0.0
+        return previous_count, previous_ttl, current_count, window_end + expiry - now
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._lock:
+            self._transaction()
+            try:
+                previous_count, previous_ttl, current_count, _ = self._window_info(key, expiry, now)
+                weighted = previous_count * previous_ttl / expiry + current_count
+                allowed = floor(weighted) + amount <= limit
+                if allowed:
+                    # Kept for two windows so it can serve as the next "previous" one
+                    _, current_key, window_end = self._window_keys(key, expiry, now)
+                    self._incr(current_key, window_end + expiry - now, amount, now)
+                self._maybe_sweep(now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return allowed
+
+    def get_sliding_window(self, key, expiry):
+        with self._lock:
+            return self._window_info(key, expiry, time.time())
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key, _ = self._window_keys(key, expiry, time.time())
+        with self._lock:
+            self._db.execute("DELETE FROM counters WHERE key IN (?, ?)", (previous_key, current_key))
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM counters").fetchone()[0]
+        return {"path": self.path, "counters": rows}
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from flora_common.service_metrics import LatencyTracker
+
+
+class SupabaseClient:
+    """Supabase REST client with a shared keep-alive connection pool.
+
+    One requests.Session holds up to `pool_size` open connections, so
+    register/login reuse TCP+TLS connections instead of opening a new one
+    per call. Idempotent methods (GET, HEAD, PUT, DELETE, ...) are retried
+    with exponential backoff on connection errors and 5xx/429 responses.
+    POST and PATCH are not retried.
+    """
+
+    def __init__(self, base_url, api_key, pool_size=10, retries=3, backoff=0.2, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        # Called with ('supabase', seconds) after every request
+        self.stage_observer = None
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'apikey': api_key,
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'Prefer': 'return=representation'
+        })
+
+    def request(self, method, path, data=None, timeout=None):
+        """Send one request and record its latency under "<METHOD> <table>"."""
+        operation = f"{method} {path.split('?')[0]}"
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}/{path}", json=data, timeout=timeout or self.timeout
+            )
+            ok = response.status_code < 400
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latency.record(operation, elapsed, ok)
+            if self.stage_observer is not None:
+                self.stage_observer('supabase', elapsed)
+
+    def stats(self):
+        return self.latency.stats()
+
+
+class AsyncSupabaseClient:
+    """asyncio counterpart of SupabaseClient, built on aiohttp.
+
+    Connections are kept alive in a pool of `pool_size`. Call start()
+    from inside the running loop before use and close() on shutdown.
+    Idempotent methods are retried on connection errors and 429/5xx,
+    the same as SupabaseClient.
+    """
+
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+    IDEMPOTENT_METHODS = Retry.DEFAULT_ALLOWED_METHODS
+
+    def __init__(self, base_url, api_key, pool_size=10, retries=3, backoff=0.2, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        # Called with ('supabase', seconds) after every request
+        self.stage_observer = None
+        self.headers = {
+            'apikey': api_key,
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'Prefer': 'return=representation'
+        }
+        self.session = None
+
+    async def start(self):
+        import aiohttp
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, path, data=None, timeout=None):
+        """Send one request; returns (status, parsed JSON body or None)"""
+        import aiohttp
+
+        operation = f"{method} {path.split('?')[0]}"
+        attempts = 1 + (self.retries if method in self.IDEMPOTENT_METHODS else 0)
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        start = time.perf_counter()
+        ok = False
+        try:
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                try:
+                    async with self.session.request(
+                        method, f"{self.base_url}/{path}", json=data, timeout=request_timeout
+                    ) as response:
+                        if response.status in self.RETRY_STATUSES and not last:
+                            await asyncio.sleep(self.backoff * 2 ** attempt)
+                            continue
+                        ok = response.status < 400
+                        body = await response.json(content_type=None) if ok else await response.text()
+                        return response.status, body
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if last:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latency.record(operation, elapsed, ok)
+            if self.stage_observer is not None:
+                self.stage_observer('supabase', elapsed)
+
+    def stats(self):
+        return self.latency.stats()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service modules sit flat in flora-auth/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+import multiprocessing
+import types
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import rate_limit_storage
+from rate_limit_storage import SQLiteStorage, sqlite_path
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(6000.0)
+    monkeypatch.setattr(rate_limit_storage, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def _hit_many(uri, strategy, limit, hits, barrier, results):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse(limit)
+    barrier.wait()
+    results.put(sum(limiter.hit(item, 'client') for _ in range(hits)))
+
+
+@pytest.mark.parametrize('strategy', ['fixed-window', 'sliding-window-counter'])
+def test_processes_sharing_a_file_allow_exactly_the_limit(tmp_path, strategy):
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork")
+    context = multiprocessing.get_context('fork')
+    uri = f"sqlite:///{tmp_path}/limits.db"
+    processes, hits, limit = 4, 40, 100
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_hit_many, args=(uri, strategy, f"{limit}/hour", hits, barrier, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    allowed = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert sum(allowed) == limit
+
+
+def test_sliding_window_weights_the_previous_window(tmp_path, clock):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path}/limits.db")
+    limit, expiry = 10, 60
+
+    # 8 hits in window 100 (t = 6000..6060)
+    assert all(storage.acquire_sliding_window_entry('k', limit, expiry) for _ in range(8))
+
+    # A quarter into the next window the previous one still counts 8 * 0.75 = 6
+    clock.now = 6075.0
+    allowed = sum(storage.acquire_sliding_window_entry('k', limit, expiry) for _ in range(10))
+    assert allowed == 4
+    previous_count, previous_ttl, current_count, _ = storage.get_sliding_window('k', expiry)
+    assert (previous_count, previous_ttl, current_count) == (8, 45.0, 4)
+
+    # Three quarters in: 8 * 0.25 + 4 = 6, so 4 more fit
+    clock.now = 6105.0
+    allowed = sum(storage.acquire_sliding_window_entry('k', limit, expiry) for _ in range(10))
+    assert allowed == 4
+
+    # Two windows later nothing carries over
+    clock.now = 6245.0
+    allowed = sum(storage.acquire_sliding_window_entry('k', limit, expiry) for _ in range(20))
+    assert allowed == limit
+
+
+def test_sweep_removes_expired_rows(tmp_path, clock):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path}/limits.db", sweep_interval=10)
+    storage.incr('short', expiry=1)
+    storage.incr('long', expiry=3600)
+    assert storage.stats()['counters'] == 2
+
+    # Expired but not yet swept: invisible to reads, still in the table
+    clock.now += 5
+    assert storage.get('short') == 0
+    storage.incr('long', expiry=3600)
+    assert storage.stats()['counters'] == 2
+
+    clock.now += 10
+    storage.incr('long', expiry=3600)
+    assert storage.stats()['counters'] == 1
+    assert storage.get('long') == 3
+
+
+@pytest.mark.parametrize('uri, path', [
+    ('sqlite:///limits.db', 'limits.db'),
+    ('sqlite:////var/lib/flora/limits.db', '/var/lib/flora/limits.db'),
+])
+def test_sqlite_path(uri, path):
+    assert sqlite_path(uri) == path
+
+
+@pytest.mark.parametrize('uri', ['sqlite://limits.db', 'sqlite://', 'sqlite:///'])
+def test_sqlite_path_rejects_uris_without_a_file(uri):
+    with pytest.raises(ValueError):
+        sqlite_path(uri)
@@ -0,0 +1,108 @@
+"""JWT verification shared by flora-auth and the ML services.
+
+Only depends on PyJWT and Flask, so the crop and disease services can
+import it straight from this directory (put Backend/flora-auth on
+PYTHONPATH) to check tokens locally, with no call to the auth service or
+Supabase.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from flask import g, jsonify, request
+
+
+class TokenVerifier:
+    """Verifies HS256 tokens and keeps the decoded claims in an LRU.
+
+    A cached token costs a dict lookup instead of a signature check. Each
+    entry is dropped once the token's `exp` passes, so a cached token
+    never outlives its expiry. Tokens without `exp` are rejected.
+    """
+
+    def __init__(self, secret, algorithms=('HS256',), max_entries=10000, leeway=0):
+        self.secret = secret
+        self.algorithms = list(algorithms)
+        self.max_entries = max_entries
+        self.leeway = leeway
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def verify(self, token):
+        """Return the token's claims, or raise jwt.InvalidTokenError"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at + self.leeway:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return claims
+                del self._entries[token]
+                self.expired += 1
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            self.misses += 1
+
+        claims = jwt.decode(
+            token, self.secret, algorithms=self.algorithms,
+            leeway=self.leeway, options={"require": ["exp"]}
+        )
+
+        with self._lock:
+            self._entries[token] = (claims, claims['exp'])
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+def bearer_token(headers):
+    """Token from an `Authorization: Bearer <token>` header, or None"""
+    scheme, _, token = headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+
+def require_auth(verifier):
+    """Flask view decorator: 401 unless the request carries a valid bearer token.
+
+    The decoded claims are available to the view as `flask.g.user`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token(request.headers)
+            if token is None:
+                return jsonify({'error': 'Missing bearer token'}), 401
+            try:
+                g.user = verifier.verify(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({'error': 'Token expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'error': 'Invalid token'}), 401
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
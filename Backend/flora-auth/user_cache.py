@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class UserCache:
+    """Short-TTL LRU of email -> user row, including "no such user" entries.
+
+    Positive entries live for `ttl` seconds and negative ones (unknown
+    emails) for `negative_ttl`. Repeated register checks and login
+    attempts against the same email, such as credential-stuffing scans
+    for addresses that don't exist, are answered without Supabase. Writes
+    invalidate the affected entry, by email or by user id.
+
+    The cache is per process and invalidation is not shared between
+    workers. After a user registers on one worker, another worker that
+    looked the email up just before keeps answering "not found" (a 401 on
+    login) until its negative entry expires. `negative_ttl` is kept short
+    (2s) so that window stays smaller than a register-then-login round
+    trip, while a scan hammering one address is still mostly absorbed.
+    """
+
+    def __init__(self, max_entries=10000, ttl=30, negative_ttl=2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._emails_by_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        """The cached user dict, None for a cached "not found", or MISSING"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(email)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(email)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, email, user):
+        """Cache `user` for `email`; pass None to record that it doesn't exist"""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if user is not None else self.negative_ttl)
+        with self._lock:
+            self._remove(email)
+            self._entries[email] = (user, expires_at)
+            if user is not None:
+                self._emails_by_id[str(user['id'])] = email
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, email):
+        with self._lock:
+            self._remove(email)
+
+    def invalidate_id(self, user_id):
+        with self._lock:
+            email = self._emails_by_id.get(str(user_id))
+            if email is not None:
+                self._remove(email)
+
+    def _remove(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is not None and entry[0] is not None:
+            self._emails_by_id.pop(str(entry[0]['id']), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,5 @@
+"""Code shared by the Flora services.
+
+Installed into every service image (pip install ./flora-common from
+Backend/); for local runs use pip install -e flora-common.
+"""
@@ -0,0 +1,262 @@
+"""Zero-downtime model reloads with rollback, used by the crop and disease services.
+
+ModelSlot holds the model that serves requests plus the one it replaced.
+A reload loads and validates a complete new model on a background thread
+(the service's `load` and `validate` callables), then swaps it in with a
+single reference assignment: requests already running finish on the old
+model and new requests get the new one. The replaced model is kept, so a
+rollback is another swap and costs nothing; the one before it is closed
+(model.close(), if it has one) when it is evicted.
+
+Reloads start from the services' POST /admin/reload, or from the file
+watcher (start_watching with an interval > 0). The watcher polls the
+files' size and mtime and reloads once a change has been stable for one
+interval, so a file that is still being copied is not loaded. A version
+that fails to load or validate is not retried until its files change
+again.
+
+State is per process. With several gunicorn workers, the admin endpoints
+act on the worker that answers; the watcher runs in every worker (it
+stops in a process that forks, i.e. a preloading gunicorn master, and
+restarts in the forked children). A reloaded model is private to its
+worker, where a preloaded one was shared copy-on-write.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadInProgress(RuntimeError):
+    """Raised when a reload is requested while another one is running"""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _close(model):
+    close = getattr(model, 'close', None)
+    if close is not None:
+        close()
+
+
+class ModelSlot:
+    """The serving model, the previous version and the reload machinery.
+
+    `load()` returns a newly loaded model or raises. `validate(model)`
+    warms it up and checks it before it can serve, raising to reject it.
+    `activate(model)` is called on every swap so the caller can point its
+    own reference (and readiness flag) at the new model. `watch_files()`
+    lists the files whose changes trigger a reload; `metadata_path` is a
+    JSON file reported with each version.
+    """
+
+    def __init__(self, name, load, activate, watch_files, validate=None, metadata_path=None):
+        self.name = name
+        self.load = load
+        self.validate = validate
+        self.activate = activate
+        self.watch_files = watch_files
+        self.metadata_path = metadata_path
+        self.current = None
+        self.previous = None
+        self.current_info = None
+        self.previous_info = None
+        self.reload_state = {"state": "idle", "started_at": None, "finished_at": None, "error": None,
+                             "reloads": 0, "failures": 0}
+        self.watch_interval = 0
+        self._versions = itertools.count(1)
+        self._loaded_signature = None
+        self._failed_signature = None
+        self._init_locks()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_parent=self._after_fork_in_parent, after_in_child=self._after_fork_in_child)
+
+    def _init_locks(self):
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+
+    def file_signature(self):
+        """{path: (bytes, mtime_ns)} of the watched files that exist"""
+        signature = {}
+        for path in self.watch_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+        return signature
+
+    def _read_metadata(self):
+        if not self.metadata_path or not os.path.exists(self.metadata_path):
+            return None
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.metadata_path}: {str(e)}")
+            return None
+
+    def _version_info(self, signature, load_seconds):
+        return {
+            "version": next(self._versions),
+            "loaded_at": _now(),
+            "load_seconds": round(load_seconds, 3) if load_seconds is not None else None,
+            "metadata": self._read_metadata(),
+            "files": {
+                os.path.basename(path): {
+                    "bytes": size,
+                    "modified": datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).isoformat(timespec='seconds')
+                }
+                for path, (size, mtime_ns) in sorted(signature.items())
+            }
+        }
+
+    def install(self, model, load_seconds=None):
+        """Record the model loaded at startup as the first version"""
+        signature = self.file_signature()
+        with self._swap_lock:
+            self.current = model
+            self.current_info = self._version_info(signature, load_seconds)
+        self._loaded_signature = signature
+
+    def _swap(self, model, info):
+        with self._swap_lock:
+            evicted = self.previous
+            self.previous, self.previous_info = self.current, self.current_info
+            self.current, self.current_info = model, info
+            self.activate(model)
+        # Two versions back: nothing can be using it any more
+        _close(evicted)
+
+    def _build(self):
+        model = self.load()
+        if self.validate is not None:
+            try:
+                self.validate(model)
+            except Exception:
+                _close(model)
+                raise
+        return model
+
+    def reload(self):
+        """Load, validate and swap in a new model; returns its version info"""
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress(f"A {self.name} model reload is already running")
+        try:
+            return self._reload_locked()
+        finally:
+            self._reload_lock.release()
+
+    def reload_async(self):
+        """Start reload() on a background thread"""
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress(f"A {self.name} model reload is already running")
+        self.reload_state.update(state="loading", started_at=_now(), finished_at=None, error=None)
+
+        def run():
+            try:
+                self._reload_locked()
+            except Exception:
+                pass  # recorded in reload_state
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=run, name=f"{self.name}-model-reload", daemon=True).start()
+
+    def _reload_locked(self):
+        self.reload_state.update(state="loading", started_at=_now(), finished_at=None, error=None)
+        # Taken before loading, so changes made while loading trigger another reload
+        signature = self.file_signature()
+        start = time.perf_counter()
+        try:
+            model = self._build()
+        except Exception as e:
+            self._failed_signature = signature
+            self.reload_state.update(state="failed", finished_at=_now(), error=str(e))
+            self.reload_state["failures"] += 1
+            logger.error(f"{self.name} model reload failed, still serving version "
+                         f"{self.current_info['version'] if self.current_info else None}: {str(e)}")
+            raise
+
+        info = self._version_info(signature, time.perf_counter() - start)
+        self._swap(model, info)
+        self._loaded_signature = signature
+        self._failed_signature = None
+        self.reload_state.update(state="idle", finished_at=_now())
+        self.reload_state["reloads"] += 1
+        logger.info(f"{self.name} model version {info['version']} is serving "
+                    f"(loaded in {info['load_seconds']}s)")
+        return info
+
+    def rollback(self):
+        """Swap the previous version back in; returns its version info"""
+        with self._swap_lock:
+            if self.previous is None:
+                raise LookupError(f"No previous {self.name} model version to roll back to")
+            self.current, self.previous = self.previous, self.current
+            self.current_info, self.previous_info = self.previous_info, self.current_info
+            self.activate(self.current)
+            info = self.current_info
+        logger.info(f"{self.name} model rolled back to version {info['version']}")
+        return info
+
+    def status(self):
+        return {
+            "current": self.current_info,
+            "previous": self.previous_info,
+            "reload": dict(self.reload_state),
+            "watch_interval": self.watch_interval or None
+        }
+
+    def start_watching(self, interval):
+        """Poll the watched files every `interval` seconds and reload on changes"""
+        self.watch_interval = interval
+        if interval > 0 and self._watcher is None:
+            self._stop_watching = threading.Event()
+            self._watcher = threading.Thread(target=self._watch, name=f"{self.name}-model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        stop = self._stop_watching
+        pending = None
+        while not stop.wait(self.watch_interval):
+            signature = self.file_signature()
+            if signature == self._loaded_signature or signature == self._failed_signature:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll: wait for it to settle
+                pending = signature
+                continue
+            pending = None
+            try:
+                self.reload()
+            except ReloadInProgress:
+                pass
+            except Exception:
+                pass  # logged and recorded; retried when the files change again
+
+    def _after_fork_in_parent(self):
+        # A process that forks workers (gunicorn's preloading master) doesn't
+        # serve requests, so it shouldn't spend memory and CPU on reloads
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher = None
+
+    def _after_fork_in_child(self):
+        # Locks may have been held by threads that don't exist in the child
+        self._init_locks()
+        self._watcher = None
+        if self.reload_state["state"] == "loading":
+            self.reload_state.update(state="idle", error="interrupted by fork")
+        if self.watch_interval:
+            self.start_watching(self.watch_interval)
@@ -0,0 +1,300 @@
+"""Prometheus-style metrics shared by the Flora services.
+
+Each service creates one ServiceMetrics, which adds these series with its
+`service` label:
+
+    flora_http_requests_total{service, method, route, status}        counter
+    flora_http_request_duration_seconds{service, method, route}      histogram
+    flora_http_requests_in_flight{service}                           gauge
+    flora_stage_duration_seconds{service, stage}                     histogram
+
+Stages are the parts of a request the service times itself: feature
+engineering, scaling, predict_proba and SHAP for crop; decode, transform
+and forward for disease; Supabase calls and bcrypt for auth.
+
+    metrics = ServiceMetrics('crop')
+    metrics.instrument_flask(app)                  # also serves GET /metrics
+    crop_model.stage_observer = metrics.observe_stage
+
+Recording a value costs a lock and a few dict and list operations, about
+1µs. The metrics are per process: with several gunicorn workers each
+scrape sees the worker that answered it. All services in one process
+(the gateway) share one registry, so its /metrics covers both models.
+
+LatencyTracker keeps recent raw samples per operation for the JSON
+p50/p99 reports on /health (auth's Supabase calls, the gateway's
+mounted services).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latency buckets (seconds): fast auth calls up to full SHAP batches
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Stage buckets go lower: scaling or a cached lookup takes microseconds
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class ServiceMetrics:
+    """The request and stage metrics for one service, labelled with its name"""
+
+    def __init__(self, service, registry=REGISTRY):
+        self.service = service
+        self.registry = registry
+        self.requests = registry.get_or_create(
+            Counter, 'flora_http_requests_total', "HTTP requests by route and status code",
+            ('service', 'method', 'route', 'status')
+        )
+        self.latency = registry.get_or_create(
+            Histogram, 'flora_http_request_duration_seconds', "HTTP request latency by route",
+            ('service', 'method', 'route'), REQUEST_BUCKETS
+        )
+        self.in_flight = registry.get_or_create(
+            Gauge, 'flora_http_requests_in_flight', "HTTP requests being served", ('service',)
+        )
+        self.stages = registry.get_or_create(
+            Histogram, 'flora_stage_duration_seconds', "Time spent in each processing stage",
+            ('service', 'stage'), STAGE_BUCKETS
+        )
+        self._service_labels = (service,)
+        self.in_flight.set(self._service_labels, 0)
+
+    def observe_stage(self, stage, seconds):
+        self.stages.observe((self.service, stage), seconds)
+
+    def time_stage(self, stage):
+        """Context manager form of observe_stage"""
+        return _StageTimer(self, stage)
+
+    def _request_started(self):
+        self.in_flight.inc(self._service_labels)
+        return time.perf_counter()
+
+    def _request_finished(self, start, method, route, status):
+        elapsed = time.perf_counter() - start
+        self.in_flight.dec(self._service_labels)
+        self.requests.inc((self.service, method, route, str(status)))
+        self.latency.observe((self.service, method, route), elapsed)
+
+    def render(self):
+        return self.registry.render()
+
+    def instrument_flask(self, app, endpoint='/metrics'):
+        """Time every request by URL rule and serve the registry at `endpoint`"""
+        from flask import Response, request
+
+        def start_timer():
+            request.environ['flora.metrics.start'] = self._request_started()
+
+        def record_status(response):
+            request.environ['flora.metrics.status'] = response.status_code
+            return response
+
+        def record_request(exc):
+            start = request.environ.pop('flora.metrics.start', None)
+            if start is None:
+                return
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            status = request.environ.get('flora.metrics.status', 500)
+            self._request_finished(start, request.method, route, status)
+
+        # First in line, so requests rejected by other hooks (rate limits, auth) are counted too
+        app.before_request_funcs.setdefault(None, []).insert(0, start_timer)
+        app.after_request(record_status)
+        app.teardown_request(record_request)
+        app.add_url_rule(endpoint, 'metrics', lambda: Response(self.render(), content_type=CONTENT_TYPE))
+
+    def aiohttp_middleware(self):
+        """aiohttp counterpart of instrument_flask; add `aiohttp_handler` as the /metrics route"""
+        from aiohttp import web
+
+        @web.middleware
+        async def metrics_middleware(request, handler):
+            start = self._request_started()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status
+                return response
+            except web.HTTPException as e:
+                status = e.status
+                raise
+            finally:
+                resource = request.match_info.route.resource
+                route = resource.canonical if resource is not None else 'unmatched'
+                self._request_finished(start, request.method, route, status)
+
+        return metrics_middleware
+
+    async def aiohttp_handler(self, request):
+        from aiohttp import web
+        return web.Response(body=self.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.start)
+
+
+class LatencyTracker:
+    """Per-call latency samples kept in a bounded window per operation"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, ok=True):
+        with self._lock:
+            self._samples[operation].append(seconds)
+            self._counts[operation] += 1
+            if not ok:
+                self._errors[operation] += 1
+
+    @staticmethod
+    def _percentile(ordered, q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self):
+        with self._lock:
+            report = {}
+            for operation, samples in self._samples.items():
+                ordered = sorted(samples)
+                report[operation] = {
+                    "count": self._counts[operation],
+                    "errors": self._errors[operation],
+                    "p50_ms": 1000 * self._percentile(ordered, 0.50),
+                    "p99_ms": 1000 * self._percentile(ordered, 0.99),
+                    "mean_ms": 1000 * sum(ordered) / len(ordered)
+                }
+            return report
@@ -0,0 +1,235 @@
+"""Structured, non-blocking logging shared by the Flora services.
+
+configure_logging(service) replaces the root handlers with one that puts
+records on a bounded in-memory queue. A background listener thread
+formats and writes them to stderr, so a request thread never waits on
+stdout/stderr I/O. With a full queue (a log burst faster than stderr
+drains) records are dropped and counted, not blocked on.
+
+- One JSON object per line: ts, level, logger, service, msg and the
+  record's `fields` (logger.info("...", extra={'fields': {...}}))
+- Secrets in fields are replaced by "[redacted]" (passwords, hashes,
+  tokens, API keys) and email addresses are masked, at any nesting depth
+  and inside messages (e.g. urllib3's request lines)
+- DEBUG records are sampled, 1 in LOG_DEBUG_SAMPLE_EVERY per call site,
+  so per-request debug events cost the same under a burst as when idle
+
+Environment:
+    LOG_LEVEL               INFO
+    LOG_FORMAT              json, or text for key=value lines
+    LOG_QUEUE_SIZE          10000 records
+    LOG_DEBUG_SAMPLE_EVERY  1 (keep every DEBUG record)
+
+The listener is restarted in forked children (gunicorn workers), since
+threads do not survive fork.
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+
+REDACTED = '[redacted]'
+# Lower-cased field names containing any of these are redacted
+SECRET_MARKERS = ('password', 'token', 'secret', 'authorization', 'apikey', 'api_key', 'cookie')
+EMAIL_KEYS = ('email',)
+EMAIL_PATTERN = re.compile(r'([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+)')
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'fields'}
+
+
+def _is_secret(key):
+    key = key.lower()
+    return any(marker in key for marker in SECRET_MARKERS)
+
+
+def mask_email(value):
+    """a***@example.com"""
+    if not isinstance(value, str) or '@' not in value:
+        return value
+    local, _, domain = value.partition('@')
+    return f"{local[:1]}***@{domain}"
+
+
+def mask_emails(text):
+    """mask_email for every address inside a longer string"""
+    if '@' not in text:
+        return text
+    return EMAIL_PATTERN.sub(r'\1***@\2', text)
+
+
+def redact(value):
+    """Copy of `value` with secret fields redacted and emails masked"""
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            name = str(key)
+            if _is_secret(name):
+                redacted[key] = REDACTED
+            elif name.lower() in EMAIL_KEYS:
+                redacted[key] = mask_email(item)
+            else:
+                redacted[key] = redact(item)
+        return redacted
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return mask_emails(value)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """JSON lines (or key=value text) with redacted fields"""
+
+    def __init__(self, service, json_output=True):
+        super().__init__()
+        self.service = service
+        self.json_output = json_output
+
+    def _fields(self, record):
+        fields = dict(getattr(record, 'fields', None) or {})
+        # Plain `extra` keys count as fields too
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                fields[key] = value
+        return redact(fields)
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'service': self.service,
+            'msg': mask_emails(record.getMessage())
+        }
+        entry.update(self._fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+
+        if self.json_output:
+            return json.dumps(entry, default=str, ensure_ascii=False)
+        head = f"{entry.pop('ts')} {entry.pop('level'):<7} {entry.pop('logger')}: {entry.pop('msg')}"
+        entry.pop('service')
+        exc = entry.pop('exc', None)
+        line = head + ''.join(f" {key}={json.dumps(value, default=str, ensure_ascii=False)}" for key, value in entry.items())
+        return line + (f"\n{exc}" if exc else '')
+
+
+class DebugSampler(logging.Filter):
+    """Keeps 1 in `every` DEBUG records per call site; other levels pass"""
+
+    def __init__(self, every=1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counters = {}
+
+    def filter(self, record):
+        if self.every == 1 or record.levelno > logging.DEBUG:
+            return True
+        site = (record.pathname, record.lineno)
+        counter = self._counters.get(site)
+        if counter is None:
+            counter = self._counters.setdefault(site, itertools.count())
+        # next() on itertools.count is atomic under the GIL
+        return next(counter) % self.every == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record needs no pickling;
+        # formatting and redaction happen on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LoggingState:
+    def __init__(self, service, level, json_output, queue_size, sample_every):
+        self.service = service
+        self.level = level
+        self.json_output = json_output
+        self.queue_size = queue_size
+        self.sample_every = sample_every
+        self.handler = None
+        self.listener = None
+
+    def start(self):
+        log_queue = queue.Queue(self.queue_size)
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(StructuredFormatter(self.service, self.json_output))
+
+        self.handler = DroppingQueueHandler(log_queue)
+        self.handler.addFilter(DebugSampler(self.sample_every))
+        self.listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        self.listener.start()
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_in_child(self):
+        # The parent's listener thread does not exist here, and its queue
+        # may have been copied mid-operation; start over with fresh ones
+        self.listener = None
+        self.start()
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def configure_logging(service, level=None):
+    """Send all logging through the queue handler; repeat calls are no-ops"""
+    global _state
+    with _state_lock:
+        if _state is not None:
+            return _state
+        _state = _LoggingState(
+            service,
+            level=(level or os.environ.get('LOG_LEVEL', 'INFO')).upper(),
+            json_output=os.environ.get('LOG_FORMAT', 'json') != 'text',
+            queue_size=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+            sample_every=int(os.environ.get('LOG_DEBUG_SAMPLE_EVERY', 1))
+        )
+        _state.start()
+        atexit.register(_state.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_state.restart_in_child)
+        return _state
+
+
+def logging_stats():
+    if _state is None or _state.handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "level": _state.level,
+        "queued": _state.handler.queue.qsize(),
+        "queue_size": _state.queue_size,
+        "dropped": _state.handler.dropped,
+        "debug_sample_every": _state.sample_every
+    }
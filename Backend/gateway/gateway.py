@@ -0,0 +1,216 @@
+"""One process serving the crop and disease models.
+
+Mounts the unchanged service apps under /crop/* and /disease/*:
+
+    /crop/recommend, /crop/recommend/batch, /crop/recommend/sweep, /crop/crops,
+    /crop/health
+    /disease/predict, /disease/predict/batch, /disease/health
+
+Both models share the process, the torch/OpenMP compute pool, request
+metrics and /health (/health/live and /health/ready for orchestrator
+probes). /metrics serves the Prometheus-style metrics of the gateway
+and both services. A service is left out with GATEWAY_SERVICES, or
+loaded on its first request with GATEWAY_LAZY. That saves startup time
+and memory on small edge boxes that only use one model.
+
+    GATEWAY_SERVICES=crop,disease GATEWAY_LAZY=disease \
+        gunicorn -c gunicorn.conf.py gateway:application
+"""
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (service directory, Flask module file)
+SERVICES = {
+    'crop': ('Crop-Recommendation-deployment', 'app_crop.py'),
+    'disease': ('plant-disease-detection', 'app.py')
+}
+
+
+def _service_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+ENABLED_SERVICES = _service_list(os.environ.get('GATEWAY_SERVICES', 'crop,disease'))
+LAZY_SERVICES = set(_service_list(os.environ.get('GATEWAY_LAZY', '')))
+
+# Threads for the shared torch / OpenMP compute pool (0 = library default).
+# Has to be set before torch or xgboost are imported.
+COMPUTE_THREADS = int(os.environ.get('GATEWAY_COMPUTE_THREADS', 0))
+if COMPUTE_THREADS:
+    os.environ.setdefault('OMP_NUM_THREADS', str(COMPUTE_THREADS))
+
+from flask import Flask, jsonify
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+from flora_common.service_metrics import LatencyTracker, ServiceMetrics
+from flora_common.structured_logging import configure_logging
+
+# Before the services load, so their own configure_logging calls are no-ops
+configure_logging('gateway')
+logger = logging.getLogger(__name__)
+
+unknown = set(ENABLED_SERVICES) - set(SERVICES)
+if unknown:
+    raise ValueError(f"Unknown GATEWAY_SERVICES: {', '.join(sorted(unknown))}")
+
+
+class ServiceMount:
+    """WSGI app that imports a service's Flask module now or on first request"""
+
+    def __init__(self, name, directory, filename, lazy=False):
+        self.name = name
+        self.directory = os.path.join(BACKEND_DIR, directory)
+        self.filename = filename
+        self.lazy = lazy
+        self.module = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    def load(self):
+        if self.module is not None:
+            return self.module
+        with self._lock:
+            if self.module is None:
+                start = time.perf_counter()
+                if self.directory not in sys.path:
+                    sys.path.insert(0, self.directory)
+                # Unique module name, so the disease service's app.py can't shadow another 'app' module
+                spec = importlib.util.spec_from_file_location(
+                    f"{self.name}_service", os.path.join(self.directory, self.filename)
+                )
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self.load_seconds = time.perf_counter() - start
+                self.module = module
+                logger.info(f"Loaded {self.name} service in {self.load_seconds:.1f}s")
+        return self.module
+
+    def __call__(self, environ, start_response):
+        return self.load().app(environ, start_response)
+
+    def after_fork(self, threads):
+        if self.module is not None:
+            self.module.after_fork(threads)
+
+    def ready(self):
+        """Lazy services count as ready before their first request loads them"""
+        if self.module is None:
+            return self.lazy
+        return bool(self.module.init_success)
+
+    def health(self):
+        if self.module is None:
+            return {"loaded": False, "lazy": self.lazy}
+        response = self.module.app.test_client().get('/health')
+        return {"loaded": True, "load_seconds": self.load_seconds, **(response.get_json() or {})}
+
+
+class RequestMetrics:
+    """Per-service request latency and status counts for the mounted apps"""
+
+    def __init__(self, app, prefixes):
+        self.app = app
+        self.prefixes = prefixes
+        self.latency = LatencyTracker()
+
+    def _service(self, path):
+        for prefix in self.prefixes:
+            if path == prefix or path.startswith(prefix + '/'):
+                return prefix.strip('/')
+        return 'gateway'
+
+    def __call__(self, environ, start_response):
+        service = self._service(environ.get('PATH_INFO', ''))
+        status = []
+
+        def recording_start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            return start_response(status_line, headers, exc_info)
+
+        start = time.perf_counter()
+        try:
+            return self.app(environ, recording_start_response)
+        finally:
+            # Time to first byte; streamed bodies keep going after this
+            ok = bool(status) and status[0] < 500
+            self.latency.record(service, time.perf_counter() - start, ok)
+
+    def stats(self):
+        return self.latency.stats()
+
+
+if COMPUTE_THREADS and any(name == 'disease' for name in ENABLED_SERVICES):
+    import torch
+    torch.set_num_threads(COMPUTE_THREADS)
+
+mounts = {
+    name: ServiceMount(name, *SERVICES[name], lazy=name in LAZY_SERVICES)
+    for name in ENABLED_SERVICES
+}
+
+
+def after_fork(threads=None):
+    """Called by gunicorn.conf.py in each worker forked from the preloaded master"""
+    for mount in mounts.values():
+        mount.after_fork(threads)
+
+
+app = Flask(__name__)
+# The mounted services record their own routes and stages in the same registry
+ServiceMetrics('gateway').instrument_flask(app)
+
+
+@app.route('/')
+def home():
+    return jsonify({
+        "message": "Flora Model Gateway",
+        "status": "running",
+        "services": {
+            name: {"prefix": f"/{name}", "loaded": mount.module is not None, "lazy": mount.lazy}
+            for name, mount in mounts.items()
+        }
+    })
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        "status": "healthy",
+        "compute_threads": COMPUTE_THREADS or None,
+        "services": {name: mount.health() for name, mount in mounts.items()},
+        "requests": application.stats()
+    })
+
+
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    return jsonify({"status": "alive"})
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """503 until every eagerly loaded service has its model loaded and warmed up"""
+    services = {name: mount.ready() for name, mount in mounts.items()}
+    ready = all(services.values())
+    return jsonify({"ready": ready, "services": services}), 200 if ready else 503
+
+
+application = RequestMetrics(
+    DispatcherMiddleware(app, {f"/{name}": mount for name, mount in mounts.items()}),
+    prefixes=[f"/{name}" for name in mounts]
+)
+
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+
+    port = int(os.environ.get('PORT', 7860))
+    run_simple('0.0.0.0', port, application, threaded=True)
@@ -0,0 +1,43 @@
+"""gunicorn settings: load the models once in the master, fork the workers.
+
+Eagerly loaded services are shared copy-on-write by every worker, while
+lazy ones (GATEWAY_LAZY) load separately in each worker on first use.
+Each worker runs cores // workers compute threads unless
+GATEWAY_COMPUTE_THREADS is set.
+
+With CROP_BACKGROUND_INIT=1 or DISEASE_BACKGROUND_INIT=1 nothing is
+preloaded: every worker opens its port at once and loads its models in
+the background.
+
+    WEB_CONCURRENCY=2 gunicorn -c gunicorn.conf.py gateway:application
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, multiprocessing.cpu_count() // 2)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 300
+preload_app = not any(
+    os.environ.get(name, '0') == '1' for name in ('CROP_BACKGROUND_INIT', 'DISEASE_BACKGROUND_INIT')
+)
+
+
+def when_ready(server):
+    # Objects loaded so far go to the permanent GC generation, so collections
+    # in the workers don't touch (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    compute_threads = int(os.environ.get('GATEWAY_COMPUTE_THREADS', 0))
+    compute_threads = compute_threads or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+
+    if server.cfg.preload_app:
+        import gateway
+        gateway.after_fork(compute_threads)
+    else:
+        # The worker imports torch and XGBoost after this; OpenMP reads the limit then
+        os.environ['OMP_NUM_THREADS'] = str(compute_threads)
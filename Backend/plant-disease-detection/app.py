@@ -1,17 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import io
+import json
+import zipfile
+import zlib
 import base64
+import hmac
 from PIL import Image
 import logging
 import sys
 import os
+import threading
+import time
 from flask_cors import CORS  # أضف ده لدعم CORS
 
 # Add current directory to path to import score
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import your model scoring
-from score import PlantDiseaseModel
+# Prometheus-style /metrics, queued JSON logging and model hot reload from
+# the shared flora_common package (Backend/flora-common, installed into the image)
+from flora_common.service_metrics import ServiceMetrics
+from flora_common.structured_logging import configure_logging
+from flora_common.model_slot import ModelSlot, ReloadInProgress
+
+configure_logging('disease')
+logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -19,9 +31,142 @@ app = Flask(__name__)
 # Enable CORS for all routes (هذا يسمح للفرونت اند يطلب من الـ API)
 CORS(app)
 
-# Initialize model
-model = PlantDiseaseModel()
-init_success = model.init()
+metrics = ServiceMetrics('disease')
+metrics.instrument_flask(app)
+
+# Optional bearer-token check on prediction endpoints, verified locally with
+# flora-auth's token_auth module (put Backend/flora-auth on PYTHONPATH)
+if os.environ.get('REQUIRE_AUTH', '0') == '1':
+    from token_auth import TokenVerifier, require_auth
+    auth_required = require_auth(TokenVerifier(os.environ['JWT_SECRET'].strip()))
+else:
+    def auth_required(view):
+        return view
+
+# Startup: by default torch and the model load before the app is served.
+# With DISEASE_BACKGROUND_INIT=1 the port opens at once and they load on a
+# background thread, followed by a warm-up inference (DISEASE_WARMUP=0 skips
+# it). /health/ready answers 503 until that is done.
+BACKGROUND_INIT = os.environ.get('DISEASE_BACKGROUND_INIT', '0') == '1'
+WARMUP = os.environ.get('DISEASE_WARMUP', '1' if BACKGROUND_INIT else '0') == '1'
+
+# Hot reload (see flora_common.model_slot): POST /admin/reload and /admin/rollback
+# with an X-Admin-Token header matching DISEASE_ADMIN_TOKEN (the endpoints
+# are off without one), and/or DISEASE_WATCH_INTERVAL seconds between polls
+# of the model files. metadata.json next to the model is reported on /health.
+ADMIN_TOKEN = os.environ.get('DISEASE_ADMIN_TOKEN', '').strip()
+WATCH_INTERVAL = float(os.environ.get('DISEASE_WATCH_INTERVAL', 0))
+METADATA_PATH = os.path.join(
+    os.environ.get('DISEASE_MODEL_DIR', os.path.dirname(os.path.abspath(__file__))), 'metadata.json'
+)
+
+# Set by load_model(); importing score pulls in torch
+score = None
+model = None
+init_success = False
+startup = {"state": "starting", "load_seconds": None, "warmup_seconds": None}
+
+def load_model():
+    """Import the scoring module, load the model, warm it up, then mark the service ready"""
+    global score, model, init_success
+    start = time.perf_counter()
+    try:
+        import score as score_module
+        score = score_module
+        model = score.PlantDiseaseModel()
+        loaded = model.init()
+    except Exception as e:
+        logger.error(f"Error loading the disease model: {str(e)}")
+        loaded = False
+    startup["load_seconds"] = round(time.perf_counter() - start, 3)
+    
+    if loaded and WARMUP:
+        start = time.perf_counter()
+        try:
+            model.warmup()
+        except Exception as e:
+            logger.error(f"Disease model warm-up failed: {str(e)}")
+        startup["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    
+    if loaded:
+        # Stage timings from here on, so the warm-up is not counted
+        model.stage_observer = metrics.observe_stage
+        models.install(model, startup["load_seconds"])
+    init_success = loaded
+    startup["state"] = "ready" if loaded else "failed"
+    models.start_watching(WATCH_INTERVAL)
+
+def load_new_model():
+    """A new model for a reload, loaded from the current model files"""
+    global score
+    import score as score_module
+    score = score_module
+    new_model = score.PlantDiseaseModel()
+    if not new_model.init():
+        raise RuntimeError("Disease model failed to initialize; see the log for details")
+    return new_model
+
+def validate_model(new_model):
+    """Warm up a reloaded model; a broken backend or batcher fails here, not on a request"""
+    new_model.warmup()
+    # Stage timings from here on, so the warm-up is not counted
+    new_model.stage_observer = metrics.observe_stage
+
+def activate_model(new_model):
+    """Point the request handlers at `new_model`"""
+    global model, init_success
+    model = new_model
+    # A reload also recovers a service whose startup load failed
+    init_success = True
+    startup["state"] = "ready"
+
+def watched_files():
+    if score is None:
+        return [METADATA_PATH]
+    files = [score.MODEL_PATH, score.CATEGORIES_PATH, METADATA_PATH,
+             os.path.join(score.disease_bundle.BUNDLE_DIR, 'manifest.json')]
+    backend = model.backend if model is not None else score.BACKEND
+    if backend == 'torchscript':
+        files.append(score.TORCHSCRIPT_PATH)
+    elif backend == 'onnx':
+        files.append(score.ONNX_PATHS.get(score.ONNX_QUANTIZATION, score.ONNX_PATHS['none']))
+    return files
+
+models = ModelSlot('disease', load_new_model, activate_model, watched_files, validate=validate_model,
+                   metadata_path=METADATA_PATH)
+
+if BACKGROUND_INIT:
+    threading.Thread(target=load_model, name="disease-model-loader", daemon=True).start()
+else:
+    load_model()
+
+def _model_unavailable():
+    """Error response while the model is loading or after it failed to load, else None"""
+    if init_success:
+        return None
+    if startup["state"] == "starting":
+        response = jsonify({"error": "Model is still loading"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({"error": "Model not initialized"}), 500
+
+def after_fork(threads=None):
+    """Called by gunicorn.conf.py in each worker forked from the preloaded master"""
+    model.after_fork(threads)
+
+def _admin_denied():
+    """Error response unless the request carries the admin token, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid admin token"}), 403
+    return None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+ZIP_CONTENT_TYPES = ('application/zip', 'application/x-zip-compressed')
+
+# Archive members larger than this are reported as errors instead of read
+MAX_ARCHIVE_MEMBER_BYTES = int(os.environ.get('DISEASE_MAX_ARCHIVE_MEMBER_BYTES', 50 * 1024 * 1024))
 
 @app.route('/')
 def home():
@@ -33,16 +178,83 @@ def home():
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    if not init_success:
+        return jsonify({
+            "status": startup["state"],
+            "model_initialized": False,
+            "startup": startup
+        })
+    
     return jsonify({
         "status": "healthy",
-        "model_initialized": init_success
+        "model_initialized": init_success,
+        "startup": startup,
+        "backend": model.backend,
+        "artifacts": model.artifact_info(),
+        "model_version": models.status(),
+        "batching": model.batching_stats(),
+        "cache": model.cache_stats()
     })
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """The process is up and serving; says nothing about the model"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """200 once the model is loaded and warmed up, 503 until then or after a failed load"""
+    return jsonify({"ready": init_success, **startup}), 200 if init_success else 503
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load the current model files as a new version and swap it in.
+
+    Answers 202 at once and loads in the background; ?wait=1 answers when
+    the new version is serving (200) or failed to load (500).
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        if request.args.get('wait') == '1':
+            models.reload()
+            return jsonify({"status": "reloaded", **models.status()})
+        models.reload_async()
+        return jsonify({"status": "loading", **models.status()}), 202
+    except ReloadInProgress as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": "Reload failed, previous version still serving", "details": str(e)}), 500
+
+@app.route('/admin/rollback', methods=['POST'])
+def admin_rollback():
+    """Swap the previous model version back in"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        models.rollback()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"status": "rolled back", **models.status()})
+
+def _get_top_k():
+    """Optional top_k (query string or form field): how many classes/crops to detail"""
+    value = request.args.get('top_k') or request.form.get('top_k') or 0
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        return None
+    return top_k if top_k >= 0 else None
+
 @app.route('/predict', methods=['POST'])
+@auth_required
 def predict():
     try:
-        if not init_success:
-            return jsonify({"error": "Model not initialized"}), 500
+        unavailable = _model_unavailable()
+        if unavailable:
+            return unavailable
         
         if 'file' not in request.files:
             return jsonify({"error": "No file provided"}), 400
@@ -55,14 +267,106 @@ def predict():
         if not file.content_type.startswith('image/'):
             return jsonify({"error": "File must be an image"}), 400
         
+        top_k = _get_top_k()
+        if top_k is None:
+            return jsonify({"error": "top_k must be a non-negative integer"}), 400
+        
         image_data = file.read()
-        result = model.run(image_data)
+        result = model.run(image_data, top_k=top_k)
         
         return jsonify(result)
         
+    except score.ImageTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+def _is_zip(filename, content_type):
+    return filename.lower().endswith('.zip') or content_type in ZIP_CONTENT_TYPES
+
+# Raised by ZipFile.read for a single broken member: bad CRC or header,
+# corrupt deflate data, encrypted (RuntimeError), truncated, unsupported method
+ARCHIVE_MEMBER_ERRORS = (zipfile.BadZipFile, zlib.error, RuntimeError, EOFError, NotImplementedError)
+
+def _iter_archive(stream):
+    """Yield (name, bytes, error) for image members, reading one member at a time.
+
+    A member that can't be read gets an error and the rest of the archive
+    is still read; only an unreadable central directory raises BadZipFile.
+    """
+    with zipfile.ZipFile(stream) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith('__MACOSX/') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > MAX_ARCHIVE_MEMBER_BYTES:
+                yield name, None, f"Archive member over {MAX_ARCHIVE_MEMBER_BYTES} bytes"
+                continue
+            try:
+                data = archive.read(info)
+            except ARCHIVE_MEMBER_ERRORS as e:
+                yield name, None, f"Unreadable archive member: {str(e) or type(e).__name__}"
+                continue
+            yield name, data, None
+
+def _iter_uploads(uploads):
+    """Yield (name, bytes, error) for every uploaded image and archive member"""
+    for filename, content_type, stream in uploads:
+        if _is_zip(filename, content_type):
+            yield from _iter_archive(stream)
+        else:
+            yield filename, stream.read(), None
+
+@app.route('/predict/batch', methods=['POST'])
+@auth_required
+def predict_batch():
+    """Score many images (multiple `files` fields and/or zip archives).
+
+    Results are streamed back as NDJSON, one line per image, while the
+    upload is still being processed; a final summary line closes the stream.
+    """
+    unavailable = _model_unavailable()
+    if unavailable:
+        return unavailable
+    
+    files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+    
+    top_k = _get_top_k()
+    if top_k is None:
+        return jsonify({"error": "top_k must be a non-negative integer"}), 400
+    
+    # Flask closes request.files when the view returns, before the response
+    # is streamed, so hand the open streams over to the generator
+    uploads = []
+    for file in files:
+        uploads.append((file.filename, file.content_type, file.stream))
+        file.stream = io.BytesIO()
+    
+    def generate():
+        count = errors = 0
+        
+        # Unreadable members go through run_many as errors, so every line
+        # comes out in archive order
+        items = ((name, data if error is None else ValueError(error)) for name, data, error in _iter_uploads(uploads))
+        
+        try:
+            for name, result in model.run_many(items, top_k=top_k):
+                count += 1
+                errors += "error" in result
+                yield json.dumps({"file": name, **result}) + "\n"
+        except zipfile.BadZipFile as e:
+            errors += 1
+            yield json.dumps({"error": f"Invalid archive: {str(e)}"}) + "\n"
+        finally:
+            for _, _, stream in uploads:
+                stream.close()
+        
+        yield json.dumps({"done": True, "count": count, "errors": errors}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 7860)) 
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collect single-image requests into batches for one forward pass.
+
+    Callers `submit` a preprocessed (C, H, W) tensor and block on the
+    returned Future. A background thread takes the first waiting request,
+    keeps gathering until `max_batch_size` images are queued or
+    `max_wait_ms` has passed, stacks them and calls `infer_fn` once. Row i
+    of the output goes back to the i-th caller.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=5):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_size_histogram = Counter()
+        self.batches = 0
+        self.images = 0
+        self.closed = False
+        self._start()
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Orders submit() against close(), so nothing is queued behind the stop marker
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="disease-micro-batcher", daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """Threads don't survive fork(): give a forked worker its own queue and thread"""
+        self.batch_size_histogram = Counter()
+        self.batches = 0
+        self.images = 0
+        self._start()
+
+    def submit(self, image_tensor):
+        future = Future()
+        with self._submit_lock:
+            if not self.closed:
+                self._queue.put((image_tensor, future))
+                return future
+        # Straggler on a model that has been replaced: run it on its own
+        try:
+            future.set_result(self.infer_fn(image_tensor.unsqueeze(0))[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """Stop the batching thread once the queued requests are served"""
+        with self._submit_lock:
+            self.closed = True
+            self._queue.put(None)
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # close(): serve this batch, then stop
+                self._queue.put(None)
+                break
+            items.append(item)
+
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            futures = [future for _, future in items]
+
+            try:
+                batch = torch.stack([tensor for tensor, _ in items])
+                outputs = self.infer_fn(batch)
+                for i, future in enumerate(futures):
+                    future.set_result(outputs[i])
+            except Exception as e:
+                logger.error(f"Error in batched inference: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._lock:
+                self.batches += 1
+                self.images += len(items)
+                self.batch_size_histogram[len(items)] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": True,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "images": self.images,
+                "avg_batch_size": self.images / self.batches if self.batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_size_histogram.items())}
+            }
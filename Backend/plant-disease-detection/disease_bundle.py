@@ -0,0 +1,145 @@
+"""Versioned artifact bundle for fast disease model startup.
+
+    python disease_bundle.py build [--version v3]
+    python disease_bundle.py verify
+
+bundle/
+  manifest.json     version, architecture, preprocessing constants, library
+                    versions, sha256 + size per file
+  weights.pt        state_dict in torch's zip format, memory-mapped on load
+  categories.json   class names in output order
+
+The service builds ResNet-50 on the meta device and then assigns the
+mapped tensors directly. That skips random weight initialization and the
+copy into fresh parameters. At startup every file's size is checked
+against the manifest. Full sha256 verification runs when
+DISEASE_BUNDLE_VERIFY=1.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import torch
+
+from inference_backends import MODEL_DIR
+
+FORMAT_VERSION = 1
+BUNDLE_NAME = "plant-disease-resnet50"
+BUNDLE_DIR = os.environ.get('DISEASE_BUNDLE_DIR', os.path.join(MODEL_DIR, 'bundle'))
+VERIFY_CHECKSUMS = os.environ.get('DISEASE_BUNDLE_VERIFY', '0') == '1'
+
+
+class BundleError(Exception):
+    """The bundle is missing, incomplete or doesn't match its manifest"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(bundle_dir=BUNDLE_DIR, verify_checksums=VERIFY_CHECKSUMS):
+    """Parsed manifest.json, or None when there is no bundle"""
+    path = os.path.join(bundle_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format_version')}")
+    for name, entry in manifest['files'].items():
+        file_path = os.path.join(bundle_dir, name)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != entry['bytes']:
+            raise BundleError(f"{name} is missing or has the wrong size")
+        if verify_checksums and _sha256(file_path) != entry['sha256']:
+            raise BundleError(f"{name} failed its sha256 check")
+    return manifest
+
+
+def load_categories(bundle_dir=BUNDLE_DIR):
+    with open(os.path.join(bundle_dir, 'categories.json')) as f:
+        return json.load(f)
+
+
+def load_state_dict(bundle_dir=BUNDLE_DIR, device=None, mmap=True):
+    """The bundled weights; mapped from disk rather than read when on CPU"""
+    path = os.path.join(bundle_dir, 'weights.pt')
+    if mmap and (device is None or torch.device(device).type == 'cpu'):
+        return torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    return torch.load(path, map_location=device, weights_only=True)
+
+
+def build_bundle(checkpoint_path, categories_path, bundle_dir=BUNDLE_DIR, version=None,
+                 input_size=None, normalize_mean=None, normalize_std=None):
+    """Re-save a training checkpoint and its categories as a bundle"""
+    import torchvision
+
+    state_dict = torch.load(checkpoint_path, map_location='cpu')
+    if 'state_dict' in state_dict and isinstance(state_dict['state_dict'], dict):
+        state_dict = state_dict['state_dict']
+    # Plain contiguous tensors so every one can be mapped straight from the file
+    state_dict = {key: tensor.detach().contiguous() for key, tensor in state_dict.items()}
+
+    with open(categories_path) as f:
+        categories = json.load(f)
+    num_classes = state_dict['fc.1.weight'].shape[0]
+    if num_classes != len(categories):
+        raise BundleError(f"Checkpoint has {num_classes} outputs but categories.json lists {len(categories)}")
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    torch.save(state_dict, os.path.join(bundle_dir, 'weights.pt'))
+    with open(os.path.join(bundle_dir, 'categories.json'), 'w') as f:
+        json.dump(categories, f, indent=2)
+
+    files = ['weights.pt', 'categories.json']
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "name": BUNDLE_NAME,
+        "version": version or _sha256(checkpoint_path)[:12],
+        "created_at": datetime.utcnow().isoformat(),
+        "architecture": "resnet50",
+        "num_classes": num_classes,
+        "input_size": input_size,
+        "normalize": {"mean": normalize_mean, "std": normalize_std},
+        "libraries": {"torch": torch.__version__, "torchvision": torchvision.__version__},
+        "files": {
+            name: {"sha256": _sha256(os.path.join(bundle_dir, name)),
+                   "bytes": os.path.getsize(os.path.join(bundle_dir, name))}
+            for name in files
+        }
+    }
+    # Written last: a bundle without a manifest is ignored by the loader
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    from score import CATEGORIES_PATH, INPUT_SIZE, MODEL_PATH, NORMALIZE_MEAN, NORMALIZE_STD
+
+    parser = argparse.ArgumentParser(description="Build or verify the disease model artifact bundle")
+    parser.add_argument('command', choices=('build', 'verify'))
+    parser.add_argument('--bundle-dir', default=BUNDLE_DIR)
+    parser.add_argument('--version', default=None, help="Defaults to the start of the checkpoint's sha256")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        manifest = build_bundle(
+            MODEL_PATH, CATEGORIES_PATH, args.bundle_dir, version=args.version,
+            input_size=INPUT_SIZE, normalize_mean=NORMALIZE_MEAN, normalize_std=NORMALIZE_STD
+        )
+    else:
+        manifest = read_manifest(args.bundle_dir, verify_checksums=True)
+        if manifest is None:
+            raise SystemExit(f"No bundle in {args.bundle_dir}")
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Build optimized inference artifacts for the disease model.
+
+Run once at image build time from this directory, next to the .pth weights:
+
+    python export_model.py --backend torchscript
+    python export_model.py --backend onnx --quantize dynamic static --calibration-dir samples/
+
+Each export is checked against the eager model and the results are written
+to a JSON parity report. If the sample folder is laid out as
+<class name>/<image>, the report also includes per-class accuracy for the
+categories.json classes.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import torch
+import torch.nn.functional as F
+
+from inference_backends import (
+    ONNX_PATHS, QUANTIZATION_MODES, TORCHSCRIPT_PATH, INPUT_SIZE,
+    export_onnx, export_torchscript, load_backend, quantize_onnx
+)
+from score import PlantDiseaseModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(folder, categories, limit=None):
+    """Return (path, label index or None) for the images under `folder`"""
+    class_index = {name: i for i, name in enumerate(categories)}
+    images = []
+    for root, _, files in os.walk(folder):
+        label = class_index.get(os.path.basename(root))
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(root, name), label))
+    return images[:limit] if limit else images
+
+
+def preprocess_batches(model, images, batch_size):
+    """Yield (input batch, labels) using the service's own preprocessing"""
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        tensors = [model.preprocess_image(path)[0].cpu() for path, _ in chunk]
+        yield torch.stack(tensors), [label for _, label in chunk]
+
+
+def parity_report(eager, candidate, batches, categories, disease_classes, healthy_classes):
+    """Compare a candidate backend with the eager model batch by batch"""
+    top1_matches = status_matches = total = 0
+    max_abs_diff = sum_abs_diff = 0.0
+    eager_time = candidate_time = 0.0
+    per_class = {}
+
+    for inputs, labels in batches:
+        with torch.no_grad():
+            start = time.perf_counter()
+            expected = F.softmax(eager(inputs), dim=1)
+            eager_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = F.softmax(candidate(inputs), dim=1)
+            candidate_time += time.perf_counter() - start
+
+        diff = (expected - actual).abs()
+        max_abs_diff = max(max_abs_diff, diff.max().item())
+        sum_abs_diff += diff.mean(dim=1).sum().item()
+
+        expected_top = expected.argmax(dim=1)
+        actual_top = actual.argmax(dim=1)
+        top1_matches += (expected_top == actual_top).sum().item()
+
+        expected_diseased = expected[:, disease_classes].max(dim=1).values > expected[:, healthy_classes].max(dim=1).values
+        actual_diseased = actual[:, disease_classes].max(dim=1).values > actual[:, healthy_classes].max(dim=1).values
+        status_matches += (expected_diseased == actual_diseased).sum().item()
+        total += len(inputs)
+
+        for i, label in enumerate(labels):
+            if label is None:
+                continue
+            stats = per_class.setdefault(categories[label], {"samples": 0, "eager_correct": 0, "candidate_correct": 0})
+            stats["samples"] += 1
+            stats["eager_correct"] += int(expected_top[i].item() == label)
+            stats["candidate_correct"] += int(actual_top[i].item() == label)
+
+    report = {
+        "samples": total,
+        "top1_agreement": top1_matches / total if total else 0.0,
+        "status_agreement": status_matches / total if total else 0.0,
+        "max_abs_prob_diff": max_abs_diff,
+        "mean_abs_prob_diff": sum_abs_diff / total if total else 0.0,
+        "eager_ms_per_image": 1000 * eager_time / total if total else 0.0,
+        "candidate_ms_per_image": 1000 * candidate_time / total if total else 0.0
+    }
+
+    if per_class:
+        labelled = sum(stats["samples"] for stats in per_class.values())
+        report["eager_accuracy"] = sum(s["eager_correct"] for s in per_class.values()) / labelled
+        report["candidate_accuracy"] = sum(s["candidate_correct"] for s in per_class.values()) / labelled
+        report["per_class"] = {
+            name: {
+                "samples": stats["samples"],
+                "eager_accuracy": stats["eager_correct"] / stats["samples"],
+                "candidate_accuracy": stats["candidate_correct"] / stats["samples"]
+            }
+            for name, stats in sorted(per_class.items())
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the disease model to TorchScript / ONNX")
+    parser.add_argument('--backend', choices=['torchscript', 'onnx', 'all'], default='all')
+    parser.add_argument('--quantize', nargs='*', choices=[m for m in QUANTIZATION_MODES if m != 'none'], default=[],
+                        help="int8 ONNX variants to build in addition to fp32")
+    parser.add_argument('--calibration-dir', help="Sample images for static quantization")
+    parser.add_argument('--calibration-samples', type=int, default=128)
+    parser.add_argument('--parity-dir', help="Images for the parity report (defaults to --calibration-dir)")
+    parser.add_argument('--parity-samples', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--report', default='parity_report.json')
+    args = parser.parse_args()
+
+    model = PlantDiseaseModel(backend='eager')
+    if not model.init():
+        raise SystemExit("Could not load the eager model")
+    eager = model.model.cpu()
+
+    artifacts = []
+    if args.backend in ('torchscript', 'all'):
+        export_torchscript(eager)
+        artifacts.append(('torchscript', 'none', TORCHSCRIPT_PATH))
+        logger.info(f"Wrote {TORCHSCRIPT_PATH}")
+
+    if args.backend in ('onnx', 'all'):
+        export_onnx(eager)
+        artifacts.append(('onnx', 'none', ONNX_PATHS['none']))
+        logger.info(f"Wrote {ONNX_PATHS['none']}")
+
+        for mode in args.quantize:
+            calibration = None
+            if mode == 'static':
+                if not args.calibration_dir:
+                    raise SystemExit("--quantize static needs --calibration-dir")
+                images = list_images(args.calibration_dir, model.categories, args.calibration_samples)
+                calibration = [inputs for inputs, _ in preprocess_batches(model, images, args.batch_size)]
+            quantize_onnx(mode, calibration)
+            artifacts.append(('onnx', mode, ONNX_PATHS[mode]))
+            logger.info(f"Wrote {ONNX_PATHS[mode]}")
+
+    parity_dir = args.parity_dir or args.calibration_dir
+    images = list_images(parity_dir, model.categories, args.parity_samples) if parity_dir else []
+
+    reports = {}
+    for backend, mode, path in artifacts:
+        candidate = load_backend(backend, quantization=mode, device=torch.device('cpu'))
+        if images:
+            batches = preprocess_batches(model, images, args.batch_size)
+        else:
+            # No sample images: compare on random inputs, agreement only
+            generator = torch.Generator().manual_seed(0)
+            batches = [(torch.randn(args.batch_size, 3, INPUT_SIZE, INPUT_SIZE, generator=generator), [None] * args.batch_size)
+                       for _ in range(4)]
+        reports[path] = parity_report(
+            eager, candidate, batches, model.categories, model.disease_classes, model.healthy_classes
+        )
+        logger.info(f"{path}: {json.dumps({k: v for k, v in reports[path].items() if k != 'per_class'})}")
+
+    with open(args.report, 'w') as f:
+        json.dump(reports, f, indent=2)
+    logger.info(f"Parity report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""gunicorn settings: load the model once in the master, fork the workers.
+
+With preload_app the ResNet is loaded before forking, so every worker
+shares the same (memory-mapped) weight pages copy-on-write, and adding
+workers doesn't multiply RSS. Each worker runs cores // workers torch
+threads unless DISEASE_TORCH_THREADS is set.
+
+With DISEASE_BACKGROUND_INIT=1 nothing is preloaded: every worker opens
+its port at once and loads and warms up the model in the background
+(the mapped weights are still shared through the page cache).
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app:app
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, multiprocessing.cpu_count() // 2)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 300
+preload_app = os.environ.get('DISEASE_BACKGROUND_INIT', '0') != '1'
+
+
+def when_ready(server):
+    # Objects loaded so far go to the permanent GC generation, so collections
+    # in the workers don't touch (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    torch_threads = int(os.environ.get('DISEASE_TORCH_THREADS', 0))
+    torch_threads = torch_threads or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+
+    if server.cfg.preload_app:
+        import app
+        app.after_fork(torch_threads)
+    else:
+        # The worker imports torch after this; it reads the limit then
+        os.environ['OMP_NUM_THREADS'] = str(torch_threads)
@@ -0,0 +1,159 @@
+import inspect
+import logging
+import os
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+QUANTIZATION_MODES = ('none', 'dynamic', 'static')
+
+# Model files live next to this module unless DISEASE_MODEL_DIR points elsewhere,
+# so the service also loads when started from another directory (e.g. the gateway)
+MODEL_DIR = os.environ.get('DISEASE_MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# Artifacts written by export_model.py next to the .pth weights
+TORCHSCRIPT_PATH = os.path.join(MODEL_DIR, "model_traced.pt")
+ONNX_PATHS = {
+    'none': os.path.join(MODEL_DIR, "model.onnx"),
+    'dynamic': os.path.join(MODEL_DIR, "model.dynamic-int8.onnx"),
+    'static': os.path.join(MODEL_DIR, "model.static-int8.onnx")
+}
+
+INPUT_SIZE = 128
+
+
+class TorchScriptModel:
+    """Traced + frozen ResNet50 that expects channels_last input"""
+
+    def __init__(self, path, device):
+        module = torch.jit.load(path, map_location=device)
+        module.eval()
+        # oneDNN-fused graphs can't be serialized, so they are built at load time
+        self.module = torch.jit.optimize_for_inference(module)
+
+    def __call__(self, input_batch):
+        return self.module(input_batch.contiguous(memory_format=torch.channels_last))
+
+
+class OnnxModel:
+    """ONNX Runtime session with the same tensor-in, logits-out call as the torch model"""
+
+    def __init__(self, path, num_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, input_batch):
+        inputs = np.ascontiguousarray(input_batch.detach().cpu().numpy(), dtype=np.float32)
+        outputs = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(outputs)
+
+
+def load_backend(backend, quantization='none', device=None):
+    """Load an exported artifact for `backend` ('torchscript' or 'onnx')"""
+    if backend == 'torchscript':
+        return TorchScriptModel(TORCHSCRIPT_PATH, device)
+    if backend == 'onnx':
+        num_threads = int(os.environ.get('DISEASE_ORT_THREADS', 0))
+        return OnnxModel(ONNX_PATHS[quantization], num_threads=num_threads)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+
+def _example_input(batch_size=1):
+    return torch.randn(batch_size, 3, INPUT_SIZE, INPUT_SIZE)
+
+
+def export_torchscript(model, path=TORCHSCRIPT_PATH):
+    """Trace, freeze and save the eager model in channels_last layout"""
+    model = model.cpu().eval().to(memory_format=torch.channels_last)
+    example = _example_input().contiguous(memory_format=torch.channels_last)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.freeze(traced)
+
+    frozen.save(path)
+    return path
+
+
+def export_onnx(model, path=ONNX_PATHS['none']):
+    """Export the eager model to ONNX with a dynamic batch dimension"""
+    model = model.cpu().eval()
+
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript-based one
+    export_kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs['dynamo'] = False
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            _example_input(),
+            path,
+            input_names=['input'],
+            output_names=['logits'],
+            dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=17,
+            **export_kwargs
+        )
+
+    return path
+
+
+class _CalibrationReader:
+    """Feeds preprocessed calibration batches to onnxruntime's static quantizer"""
+
+    def __init__(self, input_name, batches):
+        self.input_name = input_name
+        self._batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self._batches, None)
+        if batch is None:
+            return None
+        return {self.input_name: np.ascontiguousarray(batch.numpy(), dtype=np.float32)}
+
+
+def quantize_onnx(mode, calibration_batches=None, source=ONNX_PATHS['none']):
+    """Write an int8 copy of the fp32 ONNX model.
+
+    'dynamic' quantizes weights only. 'static' also quantizes activations
+    using ranges observed on `calibration_batches`.
+    """
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    target = ONNX_PATHS[mode]
+    prepared = source.replace('.onnx', '.prep.onnx')
+    quant_pre_process(source, prepared)
+
+    try:
+        if mode == 'dynamic':
+            quantize_dynamic(prepared, target, weight_type=QuantType.QInt8)
+        elif mode == 'static':
+            if not calibration_batches:
+                raise ValueError("Static quantization needs calibration images")
+            quantize_static(
+                prepared,
+                target,
+                _CalibrationReader('input', calibration_batches),
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8
+            )
+        else:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+
+    return target
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ImageResultCache:
+    """LRU cache of model outputs keyed on a hash of the raw upload bytes.
+
+    Values are the serialized softmax vector, so a hit can still be
+    summarized with any top_k. The in-memory layer is bounded by entry
+    count and total bytes. With `disk_path`, entries are also written to
+    a SQLite file that every worker on the host can read.
+
+    The lock only guards the in-memory layer. Disk reads and writes run
+    outside it, each thread on its own connection (WAL lets readers run
+    alongside a writer), so a slow or locked disk never holds up memory
+    hits. Disk hits don't write: their access times are queued and
+    written with the next store, which is what the pruning LRU uses.
+    """
+
+    PRUNE_EVERY = 1000
+    # Queued disk-hit access times are written once this many are pending
+    TOUCH_BATCH = 100
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, disk_path=None, disk_max_entries=100000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk_path = disk_path
+        self._disk_enabled = False
+        self._local = threading.local()
+        self._touched = {}
+        self._disk_writes = 0
+        if disk_path:
+            self._open_disk()
+
+    def _open_disk(self):
+        try:
+            db = self._connection(create=True)
+            db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, accessed REAL)")
+            self._disk_enabled = True
+        except sqlite3.Error as e:
+            logger.error(f"Disk result cache disabled: {str(e)}")
+            self._disk_enabled = False
+
+    def _connection(self, create=False):
+        """This thread's SQLite connection, or None when the disk layer is off"""
+        if not (self._disk_enabled or create):
+            return None
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self._disk_path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def make_key(image_data, namespace=''):
+        """BLAKE2b digest of the upload, prefixed with the model namespace"""
+        return f"{namespace}:{hashlib.blake2b(image_data, digest_size=16).hexdigest()}"
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._disk_get(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value)
+            self._touched[key] = time.time()
+            flush = len(self._touched) >= self.TOUCH_BATCH
+        if flush:
+            self._disk_put(None, None)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        self._disk_put(key, value)
+
+    def _store(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(key) + len(old)
+        self._entries[key] = value
+        self._bytes += len(key) + len(value)
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            old_key, old_value = self._entries.popitem(last=False)
+            self._bytes -= len(old_key) + len(old_value)
+            self.evictions += 1
+
+    def _disk_get(self, key):
+        db = self._connection()
+        if db is None:
+            return None
+        try:
+            row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            return bytes(row[0]) if row is not None else None
+        except sqlite3.Error as e:
+            logger.warning(f"Disk result cache read failed: {str(e)}")
+            return None
+
+    def _disk_put(self, key, value):
+        """Store `key` (None: only flush queued access times) in one transaction"""
+        db = self._connection()
+        if db is None:
+            return
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._disk_writes += key is not None
+            prune = key is not None and self._disk_writes % self.PRUNE_EVERY == 0
+        try:
+            db.execute("BEGIN")
+            try:
+                if key is not None:
+                    db.execute(
+                        "INSERT OR REPLACE INTO results (key, value, accessed) VALUES (?, ?, ?)",
+                        (key, value, time.time())
+                    )
+                if touched:
+                    db.executemany("UPDATE results SET accessed = ? WHERE key = ?",
+                                   [(accessed, touched_key) for touched_key, accessed in touched.items()])
+                if prune:
+                    # Keep the most recently used rows
+                    db.execute(
+                        "DELETE FROM results WHERE key NOT IN "
+                        "(SELECT key FROM results ORDER BY accessed DESC LIMIT ?)",
+                        (self.disk_max_entries,)
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Disk result cache write failed: {str(e)}")
+
+    def after_fork(self):
+        """SQLite connections must not cross fork(); each worker thread opens its own"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self._disk_path:
+            self._open_disk()
+
+    def clear(self):
+        """Drop in-memory entries; disk entries are namespaced per model and age out"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "disk": self._disk_enabled,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
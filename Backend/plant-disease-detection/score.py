@@ -1,39 +1,112 @@
 import json
 import logging
 import os
+import threading
+import time
 import numpy as np
 from PIL import Image
 import torch
 import torch.nn.functional as F
-from torchvision import transforms
 import io
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import disease_bundle
+from batching import MicroBatcher
+from inference_backends import BACKENDS, QUANTIZATION_MODES, MODEL_DIR, ONNX_PATHS, TORCHSCRIPT_PATH, load_backend
+from result_cache import ImageResultCache
 
 logger = logging.getLogger(__name__)
 
+# Dynamic micro-batching: concurrent requests share one forward pass of up
+# to MAX_BATCH_SIZE images, waiting at most MAX_BATCH_WAIT_MS to fill it
+MICRO_BATCHING = os.environ.get('DISEASE_MICRO_BATCHING', '1') == '1'
+MAX_BATCH_SIZE = int(os.environ.get('DISEASE_MAX_BATCH_SIZE', 8))
+MAX_BATCH_WAIT_MS = float(os.environ.get('DISEASE_MAX_BATCH_WAIT_MS', 5))
+
+# Inference backend: eager PyTorch, traced TorchScript or ONNX Runtime.
+# Non-eager backends load artifacts built by export_model.py.
+BACKEND = os.environ.get('DISEASE_BACKEND', 'eager').strip().lower()
+ONNX_QUANTIZATION = os.environ.get('DISEASE_ONNX_QUANTIZATION', 'none').strip().lower()
+
+# Preprocessing: model input size, ImageNet normalization, JPEG draft
+# decoding and a cap on decoded pixels
+INPUT_SIZE = 128
+NORMALIZE_MEAN = [0.485, 0.456, 0.406]
+NORMALIZE_STD = [0.229, 0.224, 0.225]
+JPEG_DRAFT = os.environ.get('DISEASE_JPEG_DRAFT', '1') == '1'
+MAX_IMAGE_PIXELS = int(os.environ.get('DISEASE_MAX_IMAGE_PIXELS', 50_000_000))
+LOG_TIMINGS = os.environ.get('DISEASE_LOG_TIMINGS', '1') == '1'
+
+# Eager weights are memory-mapped from the checkpoint (torch>=2.1), so forked
+# workers and other processes on the host share one copy through the page cache
+MMAP_WEIGHTS = os.environ.get('DISEASE_MMAP_WEIGHTS', '1') == '1'
+
+# Load the eager model from bundle/ (see disease_bundle.py) when one has been
+# built; the training checkpoint is used otherwise or when the bundle is broken
+USE_BUNDLE = os.environ.get('DISEASE_USE_BUNDLE', '1') == '1'
+
+# Multi-image requests: decode threads and images per forward pass
+DECODE_THREADS = int(os.environ.get('DISEASE_DECODE_THREADS', 4))
+STREAM_BATCH_SIZE = int(os.environ.get('DISEASE_STREAM_BATCH_SIZE', 16))
+
+# Result cache keyed on a hash of the upload bytes (0 entries disables it).
+# DISEASE_CACHE_PATH adds a SQLite store shared by the workers on a host.
+CACHE_ENTRIES = int(os.environ.get('DISEASE_CACHE_ENTRIES', 1024))
+CACHE_MAX_BYTES = int(os.environ.get('DISEASE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+CACHE_PATH = os.environ.get('DISEASE_CACHE_PATH', '').strip() or None
+
+MODEL_PATH = os.path.join(MODEL_DIR, "best_resnet50_model_by_f1.pth")
+CATEGORIES_PATH = os.path.join(MODEL_DIR, "categories.json")
+
+
+class ImageTooLargeError(ValueError):
+    """Raised before decoding an upload whose header exceeds MAX_IMAGE_PIXELS"""
+
 class PlantDiseaseModel:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or BACKEND
         self.model = None
         self.device = None
         self.categories = None
-        self.transform = None
+        self.norm_scale = None
+        self.norm_bias = None
+        self._buffers = threading.local()
         self.disease_classes = None
         self.healthy_classes = None
+        self.disease_index = None
+        self.healthy_index = None
+        self.healthy_mask = None
+        self.crop_names = None
+        self.class_crops = None
+        self.crop_index = None
+        self.batcher = None
+        self._decode_pool = None
+        self.cache = None
+        self.cache_namespace = None
+        self.bundle_manifest = None
+        # Called with (stage, seconds) for decode, transform and forward
+        self.stage_observer = None
 
     def init(self):
         try:
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             
+            self.bundle_manifest = self._read_bundle() if USE_BUNDLE and self.backend == 'eager' else None
+            
             # Load categories
-            with open('categories.json', 'r') as f:
-                self.categories = json.load(f)
+            if self.bundle_manifest is not None:
+                self.categories = disease_bundle.load_categories()
+            else:
+                with open(CATEGORIES_PATH, 'r') as f:
+                    self.categories = json.load(f)
             
-            # Define transforms
-            self.transform = transforms.Compose([
-                transforms.Resize((128, 128)),
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                                   std=[0.229, 0.224, 0.225])
-            ])
+            # ToTensor + Normalize folded into one per-channel multiply-add:
+            # (x / 255 - mean) / std == x * scale + bias
+            std = torch.tensor(NORMALIZE_STD).view(3, 1, 1)
+            mean = torch.tensor(NORMALIZE_MEAN).view(3, 1, 1)
+            self.norm_scale = 1.0 / (255.0 * std)
+            self.norm_bias = -mean / std
             
             # Load model
             self.model = self._load_model()
@@ -41,6 +114,21 @@ class PlantDiseaseModel:
             # Define disease/healthy classes
             self.disease_classes = [i for i, c in enumerate(self.categories) if "healthy" not in c.lower()]
             self.healthy_classes = [i for i, c in enumerate(self.categories) if "healthy" in c.lower()]
+            self._init_class_groups()
+            
+            # Cached outputs belong to the model being replaced
+            if self.cache is not None:
+                self.cache.clear()
+            elif CACHE_ENTRIES > 0:
+                self.cache = ImageResultCache(
+                    max_entries=CACHE_ENTRIES, max_bytes=CACHE_MAX_BYTES, disk_path=CACHE_PATH
+                )
+            self.cache_namespace = self._model_fingerprint()
+            
+            if MICRO_BATCHING and self.batcher is None:
+                self.batcher = MicroBatcher(
+                    self._infer, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS
+                )
             
             return True
             
@@ -48,12 +136,89 @@ class PlantDiseaseModel:
             logger.error(f"Error in model initialization: {str(e)}")
             return False
 
+    def _init_class_groups(self):
+        """Precompute class-group tensors so results come from whole-batch tensor ops"""
+        self.disease_index = torch.tensor(self.disease_classes, dtype=torch.long)
+        self.healthy_index = torch.tensor(self.healthy_classes, dtype=torch.long)
+        self.healthy_mask = torch.zeros(len(self.categories))
+        self.healthy_mask[self.healthy_index] = 1.0
+        
+        # Categories are "<crop>___<condition>"; map every class to its crop
+        self.class_crops = [c.split('___')[0] for c in self.categories]
+        self.crop_names = sorted(set(self.class_crops))
+        self.crop_index = torch.tensor([self.crop_names.index(c) for c in self.class_crops], dtype=torch.long)
+
+    def _read_bundle(self):
+        """The bundle's manifest, or None to fall back to the training checkpoint"""
+        try:
+            manifest = disease_bundle.read_manifest()
+            if manifest is None:
+                return None
+            # A checkpoint dropped in after the bundle was built is the newer model
+            built = os.path.getmtime(os.path.join(disease_bundle.BUNDLE_DIR, 'manifest.json'))
+            stale = [os.path.basename(path) for path in (MODEL_PATH, CATEGORIES_PATH)
+                     if os.path.exists(path) and os.path.getmtime(path) > built]
+            if stale:
+                logger.warning(f"Disease model bundle is older than {', '.join(stale)}; loading checkpoint instead")
+                return None
+            if (manifest['input_size'] != INPUT_SIZE
+                    or manifest['normalize'] != {"mean": NORMALIZE_MEAN, "std": NORMALIZE_STD}):
+                raise disease_bundle.BundleError("bundle preprocessing doesn't match this service")
+            logger.info(f"Using disease model bundle {manifest['name']} {manifest['version']}")
+            return manifest
+        except Exception as e:
+            logger.error(f"Disease model bundle unusable, loading checkpoint instead: {str(e)}")
+            return None
+
+    def _model_fingerprint(self):
+        """Identify the loaded model so shared disk cache entries never cross versions"""
+        if self.backend == 'eager' and self.bundle_manifest is not None:
+            weights = self.bundle_manifest['files']['weights.pt']
+            return f"eager-bundle-{self.bundle_manifest['version']}-{weights['sha256'][:16]}"
+        if self.backend == 'torchscript':
+            path = TORCHSCRIPT_PATH
+        elif self.backend == 'onnx':
+            path = ONNX_PATHS[ONNX_QUANTIZATION]
+        else:
+            path = MODEL_PATH
+        
+        stat = os.stat(path)
+        return f"{self.backend}-{os.path.basename(path)}-{stat.st_size}-{int(stat.st_mtime)}"
+
     def _load_model(self):
+        if self.backend == 'eager':
+            return self._load_eager_model()
+        
+        try:
+            if self.backend not in BACKENDS:
+                raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+            if ONNX_QUANTIZATION not in QUANTIZATION_MODES:
+                raise ValueError(f"ONNX quantization must be one of {', '.join(QUANTIZATION_MODES)}")
+            
+            model = load_backend(self.backend, quantization=ONNX_QUANTIZATION, device=self.device)
+            logger.info(f"Loaded {self.backend} inference backend")
+            return model
+            
+        except Exception as e:
+            logger.error(f"Error loading {self.backend} backend, falling back to eager: {str(e)}")
+            self.backend = 'eager'
+            return self._load_eager_model()
+
+    def _load_eager_model(self):
         try:
             from torchvision import models
             import torch.nn as nn
             
-            model_path = "best_resnet50_model_by_f1.pth"
+            model_path = MODEL_PATH
+            
+            if self.bundle_manifest is not None:
+                try:
+                    return self._load_bundled_model(models, nn)
+                except Exception as e:
+                    logger.error(f"Error loading bundled weights, loading checkpoint instead: {str(e)}")
+                    self.bundle_manifest = None
+                    with open(CATEGORIES_PATH, 'r') as f:
+                        self.categories = json.load(f)
             
             # Load model architecture
             model = models.resnet50(weights=None)
@@ -63,8 +228,13 @@ class PlantDiseaseModel:
                 nn.Linear(num_features, len(self.categories))
             )
             
-            state_dict = torch.load(model_path, map_location=self.device)
-            model.load_state_dict(state_dict)
+            if MMAP_WEIGHTS and self.device.type == 'cpu':
+                state_dict = self._load_mapped_state_dict(model_path)
+                # assign=True keeps the mapped tensors instead of copying into fresh parameters
+                model.load_state_dict(state_dict, assign=True)
+            else:
+                state_dict = torch.load(model_path, map_location=self.device)
+                model.load_state_dict(state_dict)
             model.to(self.device)
             model.eval()
             
@@ -74,54 +244,346 @@ class PlantDiseaseModel:
             logger.error(f"Error loading model: {str(e)}")
             raise
 
-    def preprocess_image(self, image_data):
+    def _load_bundled_model(self, models, nn):
+        # Parameters are created on the meta device (no random init) and
+        # replaced by the bundle's tensors
+        with torch.device('meta'):
+            model = models.resnet50(weights=None)
+            model.fc = nn.Sequential(
+                nn.Dropout(p=0.6),
+                nn.Linear(model.fc.in_features, len(self.categories))
+            )
+        state_dict = disease_bundle.load_state_dict(device=self.device, mmap=MMAP_WEIGHTS)
+        model.load_state_dict(state_dict, assign=True)
+        model.to(self.device)
+        model.eval()
+        return model
+
+    def _load_mapped_state_dict(self, model_path):
         try:
-            if isinstance(image_data, bytes):
-                image = Image.open(io.BytesIO(image_data))
-            else:
-                image = Image.open(image_data)
+            return torch.load(model_path, map_location='cpu', mmap=True, weights_only=True)
+        except Exception as e:
+            # Older torch, or a legacy (non-zip) checkpoint that can't be mapped
+            logger.warning(f"Could not memory-map {model_path}, loading normally: {str(e)}")
+            return torch.load(model_path, map_location='cpu')
+
+    def after_fork(self, torch_threads=None):
+        """Reset per-process state in a worker forked from a preloaded master.
+
+        The weights stay shared copy-on-write. Threads (micro-batcher,
+        decode pool), the SQLite cache handle and ONNX Runtime's thread
+        pool do not survive fork and are recreated here.
+        """
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        if self.backend == 'onnx':
+            self.model = self._load_model()
+        if self.batcher is not None:
+            self.batcher.after_fork()
+        self._decode_pool = None
+        self._buffers = threading.local()
+        if self.cache is not None:
+            self.cache.after_fork()
+
+    def close(self):
+        """Stop the threads of a model that has been replaced by a reload"""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=False)
+            self._decode_pool = None
+
+    def warmup(self):
+        """Run throwaway inferences before real traffic, around the cache and batcher.
+
+        A synthetic JPEG goes through decode and preprocessing, then one
+        forward pass runs per batch size the service will use, so the
+        allocator and backend kernels are set up before the first request.
+        """
+        buffer = io.BytesIO()
+        Image.new('RGB', (2 * INPUT_SIZE, 2 * INPUT_SIZE), (70, 130, 60)).save(buffer, format='JPEG')
+        input_tensor = self.preprocess_image(buffer.getvalue())
+        
+        batch_sizes = {1}
+        if self.batcher is not None:
+            batch_sizes.add(MAX_BATCH_SIZE)
+        for batch_size in sorted(batch_sizes):
+            self._summarize(self._infer(input_tensor.expand(batch_size, -1, -1, -1).contiguous()))
+
+    def _decode(self, image_data):
+        """Open an upload and decode it no larger than needed for the model input"""
+        if isinstance(image_data, bytes):
+            image = Image.open(io.BytesIO(image_data))
+        else:
+            image = Image.open(image_data)
+        
+        # Only the header has been read so far
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageTooLargeError(f"Image is {width}x{height}, over the {MAX_IMAGE_PIXELS} pixel limit")
+        
+        # Let libjpeg downscale by 1/2, 1/4 or 1/8 while decoding, keeping at
+        # least twice the model input size for the final resize
+        if JPEG_DRAFT and image.format == 'JPEG':
+            image.draft('RGB', (2 * INPUT_SIZE, 2 * INPUT_SIZE))
+        
+        image.load()
+        
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        return image
+
+    def _input_buffer(self):
+        """Per-thread (1, 3, H, W) input tensor reused across requests"""
+        buffer = getattr(self._buffers, 'tensor', None)
+        if buffer is None:
+            buffer = torch.empty(1, 3, INPUT_SIZE, INPUT_SIZE)
+            self._buffers.tensor = buffer
+        return buffer
+
+    def _observe(self, stage, seconds):
+        if self.stage_observer is not None:
+            self.stage_observer(stage, seconds)
+
+    def preprocess_image(self, image_data, out=None, timings=None):
+        """Decode, resize and normalize an upload into a (1, 3, H, W) tensor.
+
+        Writes into `out` when given instead of allocating. Stage durations
+        in ms are recorded in `timings` when a dict is passed, and reported
+        to `stage_observer` when one is set.
+        """
+        try:
+            start = time.perf_counter()
+            image = self._decode(image_data)
+            decoded = time.perf_counter()
+            
+            image = image.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+            pixels = torch.from_numpy(np.array(image, dtype=np.uint8))
             
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            if out is None:
+                out = torch.empty(1, 3, INPUT_SIZE, INPUT_SIZE)
+            out[0].copy_(pixels.permute(2, 0, 1))
+            out[0].mul_(self.norm_scale).add_(self.norm_bias)
             
-            image_tensor = self.transform(image).unsqueeze(0)
-            return image_tensor.to(self.device)
+            transformed = time.perf_counter()
+            if timings is not None:
+                timings['decode'] = 1000 * (decoded - start)
+                timings['transform'] = 1000 * (transformed - decoded)
+            self._observe('decode', decoded - start)
+            self._observe('transform', transformed - decoded)
+            
+            return out.to(self.device)
             
         except Exception as e:
             logger.error(f"Error in image preprocessing: {str(e)}")
             raise
 
-    def run(self, image_data):
+    def _infer(self, input_batch):
+        """Forward pass over an (N, C, H, W) batch, returning softmax probabilities"""
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model(input_batch)
+            probabilities = F.softmax(outputs, dim=1)
+        self._observe('forward', time.perf_counter() - start)
+        return probabilities
+
+    def _summarize(self, probabilities, top_k=0):
+        """Reduce (N, num_classes) probabilities to Healthy/Diseased results.
+
+        With `top_k` > 0 each result also lists the top-k classes and the
+        top-k crops by summed probability, with each crop's healthy share.
+        """
+        probabilities = probabilities.float().cpu()
+        
+        # Get top probability from each group
+        max_prob_disease = probabilities.index_select(1, self.disease_index).max(dim=1).values
+        max_prob_healthy = probabilities.index_select(1, self.healthy_index).max(dim=1).values
+        
+        results = []
+        for disease, healthy in zip(max_prob_disease.tolist(), max_prob_healthy.tolist()):
+            # Compare and determine status
+            if disease > healthy:
+                status = "Diseased"
+                overall_confidence = disease
+            else:
+                status = "Healthy"
+                overall_confidence = healthy
+            
+            results.append({
+                "status": status,
+                "overall_confidence": float(overall_confidence)
+            })
+        
+        if top_k > 0:
+            self._add_detail(results, probabilities, top_k)
+        
+        return results
+
+    def _add_detail(self, results, probabilities, top_k):
+        """Attach top-k classes and per-crop aggregates to each result"""
+        num_crops = len(self.crop_names)
+        top_probs, top_classes = probabilities.topk(min(top_k, probabilities.shape[1]), dim=1)
+        
+        # Segment sums over each crop's classes, for the whole batch at once
+        crop_probs = probabilities.new_zeros(len(probabilities), num_crops).index_add_(1, self.crop_index, probabilities)
+        crop_healthy = probabilities.new_zeros(len(probabilities), num_crops).index_add_(
+            1, self.crop_index, probabilities * self.healthy_mask
+        )
+        top_crop_probs, top_crops = crop_probs.topk(min(top_k, num_crops), dim=1)
+        crop_healthy = crop_healthy.gather(1, top_crops)
+        
+        rows = zip(top_probs.tolist(), top_classes.tolist(), top_crop_probs.tolist(), top_crops.tolist(), crop_healthy.tolist())
+        for result, (probs, classes, crop_p, crops, healthy) in zip(results, rows):
+            result["top_classes"] = [
+                {"class": self.categories[c], "crop": self.class_crops[c], "probability": p}
+                for p, c in zip(probs, classes)
+            ]
+            result["crops"] = [
+                {"crop": self.crop_names[c], "probability": p, "healthy_probability": h}
+                for p, c, h in zip(crop_p, crops, healthy)
+            ]
+
+    def _cache_lookup(self, image_data):
+        """Return (cache key, cached probabilities or None); the key is None when uncached"""
+        if self.cache is None or not isinstance(image_data, bytes):
+            return None, None
+        
+        key = self.cache.make_key(image_data, self.cache_namespace)
+        value = self.cache.get(key)
+        if value is None:
+            return key, None
+        return key, torch.from_numpy(np.frombuffer(value, dtype=np.float32).copy())
+
+    def _cache_store(self, key, probabilities):
+        if key is not None:
+            self.cache.put(key, probabilities.float().cpu().numpy().tobytes())
+
+    def run(self, image_data, top_k=0):
         try:
-            input_tensor = self.preprocess_image(image_data)
+            # Retried uploads skip decode and inference entirely
+            cache_key, cached = self._cache_lookup(image_data)
+            if cached is not None:
+                return self._summarize(cached.unsqueeze(0), top_k)[0]
             
-            with torch.no_grad():
-                outputs = self.model(input_tensor)
-                probabilities = F.softmax(outputs, dim=1)
-                
-                # Get top probability from each group
-                max_prob_disease = probabilities[0][self.disease_classes].max().item()
-                max_prob_healthy = probabilities[0][self.healthy_classes].max().item()
-
-                # Compare and determine status
-                if max_prob_disease > max_prob_healthy:
-                    status = "Diseased"
-                    overall_confidence = max_prob_disease
-                else:
-                    status = "Healthy"
-                    overall_confidence = max_prob_healthy
-
-                result = {
-                    "status": status,
-                    "overall_confidence": float(overall_confidence)
-                }
-                
-                return result
+            timings = {}
+            # The buffer is safe to reuse: this thread waits for its batch below
+            input_tensor = self.preprocess_image(image_data, out=self._input_buffer(), timings=timings)
+            
+            start = time.perf_counter()
+            if self.batcher is not None:
+                probabilities = self.batcher.submit(input_tensor[0]).result().unsqueeze(0)
+            else:
+                probabilities = self._infer(input_tensor)
+            timings['inference'] = 1000 * (time.perf_counter() - start)
+            
+            if LOG_TIMINGS:
+                logger.debug("Request timings", extra={'fields': {
+                    'timings_ms': {stage: round(ms, 1) for stage, ms in timings.items()}
+                }})
+            
+            self._cache_store(cache_key, probabilities[0])
+            
+            return self._summarize(probabilities, top_k)[0]
                 
         except Exception as e:
             logger.error(f"Error during inference: {str(e)}")
             raise
 
+    def run_many(self, items, batch_size=None, top_k=0):
+        """Score an iterable of (name, image_data) pairs in fixed-size batches.
+
+        Yields (name, result) in input order as each batch finishes. Images
+        are decoded in a thread pool, and the next batch is decoding while
+        the current one runs, so at most two batches are held in memory.
+        Undecodable images yield {"error": ...} instead of failing the run,
+        as do items whose image_data is an exception (an unreadable upload).
+        """
+        batch_size = batch_size or STREAM_BATCH_SIZE
+        if self._decode_pool is None:
+            self._decode_pool = ThreadPoolExecutor(max_workers=DECODE_THREADS, thread_name_prefix="disease-decode")
+        
+        items = iter(items)
+        pending = None
+        while True:
+            chunk = list(islice(items, batch_size))
+            submitted = [self._submit_decode(name, data) for name, data in chunk]
+            if pending:
+                yield from self._run_decoded(pending, top_k)
+            if not submitted:
+                break
+            pending = submitted
+
+    def _submit_decode(self, name, data):
+        """Return (name, cache key, cached probabilities, a decode future or an exception)"""
+        if isinstance(data, Exception):
+            return name, None, data
+        cache_key, cached = self._cache_lookup(data)
+        if cached is not None:
+            return name, cache_key, cached
+        return name, cache_key, self._decode_pool.submit(self.preprocess_image, data)
+
+    def _run_decoded(self, submitted, top_k=0):
+        """Wait for a chunk of decode futures and run one forward pass over them"""
+        outcomes = [None] * len(submitted)
+        rows = [None] * len(submitted)
+        decoded, tensors = [], []
+        for i, (_, _, pending) in enumerate(submitted):
+            if isinstance(pending, torch.Tensor):
+                rows[i] = pending
+                continue
+            if isinstance(pending, Exception):
+                outcomes[i] = {"error": str(pending)}
+                continue
+            try:
+                tensors.append(pending.result()[0])
+                decoded.append(i)
+            except Exception as e:
+                outcomes[i] = {"error": str(e)}
+        
+        if tensors:
+            try:
+                probabilities = self._infer(torch.stack(tensors)).float().cpu()
+                for i, row in zip(decoded, probabilities):
+                    rows[i] = row
+                    self._cache_store(submitted[i][1], row)
+            except Exception as e:
+                logger.error(f"Error during batch inference: {str(e)}")
+                for i in decoded:
+                    outcomes[i] = {"error": str(e)}
+        
+        # One summary pass over cached and freshly inferred rows
+        ready = [i for i, row in enumerate(rows) if row is not None]
+        if ready:
+            for i, result in zip(ready, self._summarize(torch.stack([rows[i] for i in ready]), top_k)):
+                outcomes[i] = result
+        
+        for (name, _, _), outcome in zip(submitted, outcomes):
+            yield name, outcome
+
+    def artifact_info(self):
+        """Where the loaded weights came from, for /health"""
+        if self.bundle_manifest is None:
+            return {"source": "checkpoint" if self.backend == 'eager' else self.backend}
+        return {
+            "source": "bundle",
+            "name": self.bundle_manifest["name"],
+            "version": self.bundle_manifest["version"],
+            "created_at": self.bundle_manifest["created_at"]
+        }
+
+    def cache_stats(self):
+        """Hit ratio and size of the upload-hash result cache for /health"""
+        if self.cache is None:
+            return {"enabled": False}
+        return self.cache.stats()
+
+    def batching_stats(self):
+        """Queue depth and batch-size histogram for /health"""
+        if self.batcher is None:
+            return {"enabled": False}
+        return self.batcher.stats()
+
 
 # Global model instance
 model = PlantDiseaseModel()